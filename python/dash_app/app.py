@@ -1,24 +1,32 @@
 from dash import Dash
 from layout import create_layout
 from callbacks import register_callbacks
+from routes import register_routes
 import dash_bootstrap_components as dbc
-import os
-
-external_scripts = [
-    'https://cdnjs.cloudflare.com/ajax/libs/html2canvas/0.4.1/html2canvas.min.js',
-    "https://cdnjs.cloudflare.com/ajax/libs/html2pdf.js/0.10.1/html2pdf.bundle.min.js",
-    'https://cdnjs.cloudflare.com/ajax/libs/jspdf/1.3.2/jspdf.min.js',
-]
 
 external_stylesheets = dbc.themes.YETI
 
-app = Dash(__name__, external_stylesheets=[external_stylesheets], external_scripts=external_scripts)
-
-app.title = "ED Simulation"
-
-app.layout = create_layout()
-
-register_callbacks(app)
+def create_app():
+    """
+    Application factory. Builds the Dash app with its layout, callbacks and 
+    the Flask routes serving the PDF reports.
+    The simulation engine (simpy, pandas, plotly.express, tqdm) is only imported
+    by the callbacks that run or plot a simulation, so a WSGI worker boots
+    without loading it.
+    ============
+    RETURNS:
+    ============
+    - app: dash.Dash
+        Configured Dash application. The WSGI callable is `app.server`.
+    ============
+    """
+    app = Dash(__name__, external_stylesheets=[external_stylesheets])
+    app.title = "ED Simulation"
+    app.layout = create_layout()
+    register_callbacks(app)
+    register_routes(app.server)
+    return app
 
 if __name__ == '__main__':
-    app.run_server(debug=False, dev_tools_hot_reload=True)
\ No newline at end of file
+    app = create_app()
+    app.run_server(debug=False, dev_tools_hot_reload=True)
@@ -1,80 +1,197 @@
-from dash import Input, Output, State, callback, dcc, html, callback_context, ClientsideFunction
+from dash import Input, Output, State, callback, dcc, html, callback_context, ClientsideFunction, no_update
 from dash.dependencies import ALL
 import dash_bootstrap_components as dbc
-from models.simulation import run_simulation
-from views.simulation_view import create_simulation_view, create_simulation_graph
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
-import time
+from models.simulation import compute_kpis, scenario_from_rows, validate_scenario
+from models.result_store import load_result
+from models.live_runs import start_live_run, read_live_run, abort_live_run
+from models.surrogate import get_surrogate, features_from_rows, KPIS
+from utils.report_jobs import submit_report, report_status
+from views.simulation_view import create_simulation_view
+from views.comparison_view import create_comparison_figure
+from views.live_view import create_live_figure, create_live_extend_data
+from views.surrogate_view import create_surrogate_estimate
+from utils.ref_parameters import MAX_SIMULATIONS, SIMULATIONS_PER_PAGE
 
 def register_callbacks(app):
 
     @app.callback(
-        Output('simulation-container', 'children'),
-        Output('alert-container', 'children'),
         Output('simulation-data-store', 'data'),
+        Output('alert-container', 'children'),
+        Output('live-run-store', 'data'),
+        Output('live-interval', 'disabled'),
+        Output('live-graph', 'figure'),
+        Output('live-container', 'style'),
+        Output('live-status', 'children'),
+        Output('add-simulation-button', 'disabled'),
         Input('add-simulation-button', 'n_clicks'),
         Input({'type': 'remove-button', 'index': ALL}, 'n_clicks'),
-        Input('simulation-parameters-table', 'data'),
-        Input('simulation-parameters-table', 'columns'),
-        Input('simulation-parameters-acuity-table', 'data'),
-        Input('simulation-parameters-acuity-table', 'columns'),
-        Input('simulation-start-date', 'date'),
-        State('simulation-container', 'children'),
-        State('simulation-data-store', 'data')
+        State('simulation-parameters-table', 'data'),
+        State('simulation-parameters-acuity-table', 'data'),
+        State('simulation-parameters-acuity-table', 'columns'),
+        State('simulation-start-date', 'date'),
+        State('simulation-data-store', 'data'),
+        State('live-container', 'style')
     )
-    def manage_simulations(add_clicks, remove_clicks, rows, columns, rows_acuity, columns_acuity, start_date, children, simulation_data):
+    def manage_simulations(add_clicks, remove_clicks, rows, rows_acuity, columns_acuity, start_date, simulation_data, live_style):
+        # The store only holds parameters, KPIs and the id of the full result,
+        # which stays on the server until a detailed panel needs it.
         ctx = callback_context
-        if children is None:
-            children = []
         if simulation_data is None:
             simulation_data = []
         alert = None
-        if not ctx.triggered:
-            return children, alert, simulation_data
+        live_outputs = [no_update]*6
+        # remove buttons also trigger when they are first rendered, with no clicks
+        if not ctx.triggered or not ctx.triggered[0]['value']:
+            return no_update, alert, *live_outputs
         rows.append({'property':'START DATE', 'value':start_date})
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
+        button_id = ctx.triggered_id
         if button_id == 'add-simulation-button':
-            if len(children) >= 3:
-                alert = dbc.Alert("You can only add up to 3 simulations. Remove one of the simulations to continue.", color="warning")
-                return children, alert, simulation_data
-            simulation_dict = run_simulation(rows + rows_acuity)
-            simulation_data.append(simulation_dict)
-            simulation_id = len(simulation_data)
-            new_simulation = create_simulation_view(add_clicks, simulation_id, simulation_dict, rows, columns, rows_acuity, columns_acuity)
-            children.append(new_simulation)
-            return children, alert, simulation_data
-        elif 'remove-button' in button_id:
-            button_id = eval(button_id)
-            index_to_remove = button_id['index']
-            children = [child for child in children if child['props']['id'] != f'simulation-div-{index_to_remove}']
-            simulation_data = [sd for sd, child in zip(simulation_data,children) if child['props']['id'] != f'simulation-div-{index_to_remove}']
-        return children, alert, simulation_data
+            if len(simulation_data) >= MAX_SIMULATIONS:
+                alert = dbc.Alert(f"You can only add up to {MAX_SIMULATIONS} simulations. Remove one of the simulations to continue.", color="warning")
+                return no_update, alert, *live_outputs
+            # the UI is held to the same limits as the API, and bad cells are reported as such
+            try:
+                scenario = validate_scenario(scenario_from_rows(rows + rows_acuity))
+            except ValueError as err:
+                alert = dbc.Alert(f"The simulation cannot be run: {err}", color="warning")
+                return no_update, alert, *live_outputs
+            # the simulation runs in the background and is added to the store by poll_live_run
+            live_run = {'run_id': start_live_run(scenario),
+                        'offset': 0,
+                        'index': add_clicks,
+                        'rows': rows,
+                        'rows_acuity': rows_acuity,
+                        'columns_acuity': columns_acuity}
+            return no_update, alert, live_run, False, create_live_figure(), {**live_style, 'display': 'block'}, "Running simulation...", True
+        elif button_id['type'] == 'remove-button':
+            simulation_data = [sd for sd in simulation_data if sd['index'] != button_id['index']]
+        return simulation_data, alert, *live_outputs
+
+    @app.callback(
+        Output('live-graph', 'extendData'),
+        Output('live-run-store', 'data', allow_duplicate=True),
+        Output('live-interval', 'disabled', allow_duplicate=True),
+        Output('live-status', 'children', allow_duplicate=True),
+        Output('live-container', 'style', allow_duplicate=True),
+        Output('add-simulation-button', 'disabled', allow_duplicate=True),
+        Output('simulation-data-store', 'data', allow_duplicate=True),
+        Input('live-interval', 'n_intervals'),
+        State('live-run-store', 'data'),
+        State('live-container', 'style'),
+        State('simulation-data-store', 'data'),
+        prevent_initial_call=True
+    )
+    def poll_live_run(n_intervals, live_run, live_style, simulation_data):
+        # Only the hours published since the last poll are sent, and appended
+        # to the live figure with extendData instead of redrawing it.
+        if not live_run:
+            return no_update, no_update, True, no_update, no_update, False, no_update
+        state, updates = read_live_run(live_run['run_id'], live_run['offset'])
+        extend_data = create_live_extend_data(updates) if updates else no_update
+        if state['status'] == 'running':
+            return extend_data, {**live_run, 'offset': live_run['offset']+len(updates)}, False, no_update, no_update, True, no_update
+        if state['status'] == 'done':
+            simulation_data = (simulation_data or []) + [{'index': live_run['index'],
+                                                          'result_id': state['result_id'],
+                                                          'kpis': compute_kpis(state['summary']),
+                                                          'rows': live_run['rows'],
+                                                          'rows_acuity': live_run['rows_acuity'],
+                                                          'columns_acuity': live_run['columns_acuity']}]
+            return extend_data, None, True, "", {**live_style, 'display': 'none'}, False, simulation_data
+        message = "Simulation aborted." if state['status'] == 'aborted' else "The simulation could not be completed."
+        return extend_data, None, True, message, no_update, False, no_update
+
+    @app.callback(
+        Output('live-status', 'children', allow_duplicate=True),
+        Input('abort-simulation-button', 'n_clicks'),
+        State('live-run-store', 'data'),
+        prevent_initial_call=True
+    )
+    def abort_simulation(n_clicks, live_run):
+        if not live_run:
+            return no_update
+        abort_live_run(live_run['run_id'])
+        return "Aborting simulation..."
+
+    @app.callback(
+        Output('simulation-container', 'children'),
+        Output('simulation-pagination', 'max_value'),
+        Output('simulation-pagination', 'active_page'),
+        Input('simulation-data-store', 'data'),
+        Input('simulation-pagination', 'active_page'),
+    )
+    def update_simulation_page(simulation_data, active_page):
+        # Only the panels of the active page are built, so the cost of this
+        # callback does not grow with the number of simulations.
+        if not simulation_data:
+            return [], 1, 1
+        max_page = (len(simulation_data)-1)//SIMULATIONS_PER_PAGE + 1
+        page = min(active_page or 1, max_page)
+        first = (page-1)*SIMULATIONS_PER_PAGE
+        children = [create_simulation_view(sd['index'], first+ii+1, load_result(sd['result_id']),
+                                           sd['rows'], sd['rows_acuity'], sd['columns_acuity'])
+                    for ii, sd in enumerate(simulation_data[first:first+SIMULATIONS_PER_PAGE])]
+        return children, max_page, page
 
     @app.callback(
-        Output({'type': 'simulation-graph', 'index': ALL}, 'children'),
+        Output('surrogate-container', 'children'),
+        Input('simulation-parameters-table', 'data'),
+        Input('simulation-parameters-acuity-table', 'data'),
         Input('simulation-data-store', 'data'),
     )
-    def update_graph(simulation_data):
-        if simulation_data is not None:
-            return create_simulation_graph(simulation_data)
-        else:
-            return []
-        
+    def update_surrogate_estimate(rows, rows_acuity, simulation_data):
+        # The surrogate answers while the parameters are edited; the store is an
+        # input so the estimate is refreshed once a new result has been learned.
+        surrogate = get_surrogate()
+        if not surrogate.trained:
+            return html.Small('Quick estimates become available after a few simulations have been run.', className="text-secondary")
+        try:
+            x = features_from_rows(rows, rows_acuity)
+        except (KeyError, TypeError, ValueError):
+            return no_update
+        mean, std, in_domain = surrogate.predict(x)
+        return create_surrogate_estimate(KPIS, mean, std, in_domain)
+
     @app.callback(
-        Output({'type': 'simulation-label', 'index': ALL}, 'children'),
-        Input({'type': 'remove-button', 'index': ALL}, 'n_clicks'),
-        State('simulation-container', 'children')   
+        Output('comparison-graph', 'figure'),
+        Input('simulation-data-store', 'data'),
+        Input('simulation-tabs', 'active_tab'),
+    )
+    def update_comparison_graph(simulation_data, active_tab):
+        # Only drawn while the comparison tab is visible
+        if active_tab != 'comparison-tab':
+            return no_update
+        return create_comparison_figure(simulation_data or [])
+    
+    @app.callback(
+        Output('report-job-store', 'data'),
+        Output('report-interval', 'disabled'),
+        Output('report-status', 'children'),
+        Output('report-url-store', 'data'),
+        Input('download-btn', 'n_clicks'),
+        Input('report-interval', 'n_intervals'),
+        State('report-job-store', 'data'),
+        State('simulation-data-store', 'data'),
+        prevent_initial_call=True
     )
-    def update_simulation_label(n_clicks, children):
-        return [f"Simulation {ch+1}" for ch in range(len(children))]
+    def generate_report(n_clicks, n_intervals, job_id, simulation_data):
+        # The report is built in a background thread on the server; this
+        # callback starts it and then polls until the PDF is ready.
+        if callback_context.triggered_id == 'download-btn':
+            if not simulation_data:
+                return None, True, "Add a simulation to generate a report.", no_update
+            return submit_report(simulation_data), False, "Generating report...", no_update
+        status = report_status(job_id) if job_id else 'unknown'
+        if status == 'pending':
+            return no_update, False, no_update, no_update
+        if status == 'done':
+            return None, True, "", f'/report/{job_id}/pdf'
+        return None, True, "The report could not be generated.", no_update
     
     app.clientside_callback(
         ClientsideFunction(
             namespace='clientside',
-            function_name='generate_pdf_function'
+            function_name='download_report'
         ),
-        Input('download-btn', 'n_clicks'),
-        prevent_initial_call=True)
\ No newline at end of file
+        Input('report-url-store', 'data'),
+        prevent_initial_call=True)
@@ -0,0 +1,26 @@
+'''
+Gunicorn settings for serving the Dash app with several worker processes.
+Every value can be overridden from the environment, so scaling up is a matter
+of setting WEB_CONCURRENCY.
+'''
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8050")
+# Simulations are CPU bound and run outside the workers: each worker starts up to
+# ED_LIVE_RUN_PROCESSES processes for the live runs of its users, and API jobs run in
+# separate processes, ED_API_CONCURRENCY at a time for the whole server. Workers answer
+# polls, draw figures and build reports (ED_REPORT_THREADS threads each).
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("THREADS", 1))
+# Import the app once in the master and fork it, so the layout and Dash
+# bundles are shared copy-on-write between workers
+preload_app = True
+# Requests are short, simulations and reports run in the background. The timeout only
+# restarts a stuck worker, with room for the figures of large comparisons
+timeout = int(os.environ.get("TIMEOUT", 60))
+# Workers are not recycled (0): the 1 s polls of the live runs and reports would use up
+# any request limit within minutes, and a recycled worker takes its waiting live runs
+# and running reports with it. Simulations run in other processes and do not grow the workers
+max_requests = int(os.environ.get("MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", 0))
@@ -1,8 +1,10 @@
-# from dash import dcc, html, dash_table
-from dash_extensions.enrich import DashProxy, html, Output, Input, dcc
+from dash import html, dcc
 import dash_bootstrap_components as dbc
 from datetime import date, datetime
 from views.table_view import create_parameters_table, create_parameters_acuity_table
+from views.comparison_view import create_comparison_view
+from views.live_view import create_live_view
+from views.surrogate_view import create_surrogate_view
 
 def create_layout():
     return html.Div([
@@ -30,14 +32,27 @@ def create_layout():
                 )
             ], style={'margin': '1%'}),
         ], style={'display': 'flex', 'flexDirection': 'row', 'justify-content': 'space-between'}),
+        create_surrogate_view(),
         html.Button('Add Simulation', id='add-simulation-button', 
                     n_clicks=0, style={'margin': '1%', 'margin-top': '0%'},
                     className="btn btn-primary btn-lg"),
         html.Button("Download PDF", id='download-btn', 
                     n_clicks=0, style={'margin': '1%', 'margin-top': '0%'},
                     className="btn btn-primary btn-lg"),
+        html.Span(id='report-status', className="text-secondary"),
         ], className="bg-light", style={'width': 'window','margin': '2%'}),
         html.Div(id='alert-container', style={'margin': '2%', 'width': '40%'}),
-        html.Div(id='simulation-container', style={'width': 'window', 'margin': '1.5%', 'display': 'flex', 'flexDirection': 'row'}),
+        create_live_view(),
+        dbc.Tabs([
+            dbc.Tab(create_comparison_view(), label='Comparison', tab_id='comparison-tab'),
+            dbc.Tab([
+                dbc.Pagination(id='simulation-pagination', max_value=1, active_page=1, 
+                               fully_expanded=False, style={'margin': '1.5%', 'margin-bottom': '0%'}),
+                html.Div(id='simulation-container', style={'width': 'window', 'margin': '1.5%', 'display': 'flex', 'flexDirection': 'row'}),
+            ], label='Details', tab_id='details-tab'),
+        ], id='simulation-tabs', active_tab='details-tab', style={'margin': '0% 2%'}),
         dcc.Store(id='simulation-data-store'),
+        dcc.Store(id='report-job-store'),
+        dcc.Store(id='report-url-store'),
+        dcc.Interval(id='report-interval', interval=500, disabled=True),
     ])
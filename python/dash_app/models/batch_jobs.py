@@ -0,0 +1,199 @@
+'''
+Simulation jobs submitted through the HTTP API.
+Jobs run in a small pool of separate processes, so batch clients do not compete
+with the interactive app for the web worker's CPU and interpreter lock. At most
+API_CONCURRENCY jobs run at a time on the whole server, whatever the number of
+web workers: a job first takes one of API_CONCURRENCY lock files in API_SLOT_DIR.
+Each web worker admits at most API_MAX_PENDING queued or running jobs and rejects
+the rest, so callers are asked to retry instead of piling up work. Job state and
+results are kept in the shared result cache, so any worker can answer a poll.
+'''
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from models.result_store import get_cache
+
+# Simulations run at the same time for the API, over all web workers
+API_CONCURRENCY = int(os.environ.get("ED_API_CONCURRENCY", 1))
+API_SLOT_DIR = os.environ.get("ED_API_SLOT_DIR", os.path.join(tempfile.gettempdir(), "ed_simulation_api_slots"))
+# Jobs queued or running per web worker before new submissions are rejected,
+# the server as a whole accepts up to WEB_CONCURRENCY times as many
+API_MAX_PENDING = int(os.environ.get("ED_API_MAX_PENDING", 20))
+# Default and maximum run time of a job, in seconds
+API_JOB_TIMEOUT = float(os.environ.get("ED_API_JOB_TIMEOUT", 300))
+
+_executor = None
+_pending = threading.BoundedSemaphore(API_MAX_PENDING)
+_logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """
+    Raised when a web worker already has API_MAX_PENDING jobs queued or running.
+    """
+
+def _get_executor(replace=False):
+    global _executor
+    if replace and _executor is not None:
+        # a pool whose process died refuses new work, start a new one
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=API_CONCURRENCY, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def _job_done(job_id, future):
+    _pending.release()
+    # the job reports its own errors, an exception here means its process died (e.g. out of memory)
+    if not future.cancelled() and future.exception() is not None:
+        _set_state(job_id, status='failed', error=repr(future.exception()), finished=datetime.now().isoformat())
+
+def _set_state(job_id, **state):
+    cache = get_cache()
+    current = cache.get(f"api:{job_id}") or {}
+    current.update(state)
+    cache.set(f"api:{job_id}", current)
+
+def compact_result(scenario, result):
+    """
+    Convert a simulation result to a compact columnar form: one list per property and acuity,
+    with the time of each value given by the start and the interval of the bins.
+    ===========
+    ARGUMENTS:
+    ===========
+    - scenario: dict
+        Scenario of the simulation.
+    - result: dict
+        Result returned by models.simulation.run_scenario.
+    ============
+    RETURNS:
+    ============
+    - compact: dict
+        'start', 'interval_hours', 'length', 'series' ({property: {acuity: values}}) and 'summary'.
+    ============
+    """
+    data = result['data']
+    properties = [key for key in data if key not in ('Acuity', 'Time')]
+    series = {prop: {} for prop in properties}
+    for prop in properties:
+        for acuity, value in zip(data['Acuity'], data[prop]):
+            series[prop].setdefault(acuity, []).append(None if value is None else float(value))
+    return {'start': datetime.strptime(scenario['start_date'], "%Y-%m-%d").isoformat(),
+            'interval_hours': scenario['resolution_minutes']/60,
+            'length': scenario['duration_days']*1440//scenario['resolution_minutes'],
+            'series': series,
+            'summary': result['summary']}
+
+def _acquire_slot():
+    # Wait for one of the API_CONCURRENCY slots shared by every process of the server.
+    # The lock is released when the file is closed or the process dies.
+    try:
+        import fcntl
+    except ImportError:
+        return None
+    os.makedirs(API_SLOT_DIR, exist_ok=True)
+    while True:
+        for ii in range(API_CONCURRENCY):
+            slot_file = open(os.path.join(API_SLOT_DIR, f"slot_{ii}.lock"), "w")
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot_file
+            except OSError:
+                slot_file.close()
+        time.sleep(0.2)
+
+def _run_job(job_id, scenario, timeout):
+    # runs in a pool process
+    from models.simulation import run_scenario, compute_kpis
+    from models.surrogate import update_surrogate
+    slot_file = _acquire_slot()
+    deadline = time.monotonic() + timeout
+    _set_state(job_id, status='running', started=datetime.now().isoformat())
+    try:
+        # the engine calls the publisher regularly, which stops the run once the deadline has passed
+        result = run_scenario(scenario, publisher=lambda update: time.monotonic() > deadline)
+        if result['aborted']:
+            _set_state(job_id, status='timeout', finished=datetime.now().isoformat())
+            return
+        get_cache().set(f"api:{job_id}:result", compact_result(scenario, result))
+        _set_state(job_id, status='done', finished=datetime.now().isoformat())
+    except Exception as err:
+        _set_state(job_id, status='failed', error=repr(err), finished=datetime.now().isoformat())
+        return
+    finally:
+        if slot_file is not None:
+            slot_file.close()
+    # the job is done, a failure to learn from it must not change that
+    try:
+        update_surrogate(scenario, compute_kpis(result['summary']))
+    except Exception:
+        _logger.exception("Could not update the surrogate with job %s", job_id)
+
+def submit_jobs(scenarios, timeout=None):
+    """
+    Queue simulations. Either all of them are accepted or none is.
+    ===========
+    ARGUMENTS:
+    ===========
+    - scenarios: list
+        Validated scenarios, see models.simulation.validate_scenario.
+    ============
+    OPTIONAL:
+    ============
+    - timeout: float
+        Maximum run time of each job in seconds, capped at API_JOB_TIMEOUT. Default is API_JOB_TIMEOUT.
+    ============
+    RETURNS:
+    ============
+    - job_ids: list
+        Id of the job of each scenario. A job that could not be submitted is marked as failed.
+    ============
+    RAISES:
+    ============
+    - QueueFullError
+        If accepting the scenarios would exceed API_MAX_PENDING.
+    ============
+    """
+    timeout = API_JOB_TIMEOUT if timeout is None else min(float(timeout), API_JOB_TIMEOUT)
+    acquired = 0
+    for _ in scenarios:
+        if not _pending.acquire(blocking=False):
+            for _ in range(acquired):
+                _pending.release()
+            raise QueueFullError(f"At most {API_MAX_PENDING} jobs can be queued, try again later.")
+        acquired += 1
+    job_ids = []
+    for scenario in scenarios:
+        job_id = uuid.uuid4().hex
+        _set_state(job_id, status='queued', submitted=datetime.now().isoformat(), timeout=timeout)
+        try:
+            try:
+                future = _get_executor().submit(_run_job, job_id, scenario, timeout)
+            except BrokenProcessPool:
+                future = _get_executor(replace=True).submit(_run_job, job_id, scenario, timeout)
+        except Exception as err:
+            _pending.release()
+            _set_state(job_id, status='failed', error=repr(err), finished=datetime.now().isoformat())
+        else:
+            future.add_done_callback(lambda future, job_id=job_id: _job_done(job_id, future))
+        job_ids.append(job_id)
+    return job_ids
+
+def job_status(job_id):
+    """
+    State of a job: 'status' ('queued', 'running', 'done', 'failed' or 'timeout') and timestamps,
+    or None if the job is unknown.
+    """
+    return get_cache().get(f"api:{job_id}")
+
+def job_result(job_id):
+    """
+    Compact result of a finished job (see compact_result), or None if not available.
+    """
+    return get_cache().get(f"api:{job_id}:result")
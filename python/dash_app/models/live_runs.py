@@ -0,0 +1,200 @@
+'''
+Simulations run in the background, with their partial results streamed to the UI.
+Runs are executed in a pool of separate processes, so they neither hold the web
+worker's interpreter lock nor die with it when the worker is restarted. The engine
+publishes new hours at throttled intervals; each update is stored as a separate
+entry of a cache shared by all processes, so any worker can serve them and a poll
+only reads the updates it has not seen yet. Updates are deleted once read and live
+in their own cache, so they never evict stored results.
+'''
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+import uuid
+from models.result_store import save_result
+
+# Simulations run at the same time per web worker, each in its own process
+LIVE_RUN_PROCESSES = int(os.environ.get("ED_LIVE_RUN_PROCESSES", 1))
+LIVE_CACHE_DIR = os.environ.get("ED_LIVE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ed_simulation_live"))
+# Maximum number of run states and unread updates kept, and seconds they are kept
+LIVE_CACHE_THRESHOLD = int(os.environ.get("ED_LIVE_CACHE_THRESHOLD", 5000))
+LIVE_CACHE_TIMEOUT = int(os.environ.get("ED_LIVE_CACHE_TIMEOUT", 3600))
+# Seconds without a heartbeat after which a run is reported as failed, e.g. when its process died
+LIVE_RUN_STALE = float(os.environ.get("ED_LIVE_RUN_STALE", 60))
+
+_executor = None
+_cache = None
+# runs submitted by this web worker and not finished yet, kept alive by _heartbeat_loop while they wait
+_active = set()
+_heartbeat_thread = None
+_lock = threading.Lock()
+_logger = logging.getLogger(__name__)
+
+def _get_executor(replace=False):
+    global _executor
+    if replace and _executor is not None:
+        # a pool whose process died refuses new work, start a new one
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=LIVE_RUN_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def get_live_cache():
+    """
+    Return the cache of run states and updates, creating it on first use.
+    """
+    global _cache
+    if _cache is None:
+        from cachelib import FileSystemCache
+        _cache = FileSystemCache(LIVE_CACHE_DIR, threshold=LIVE_CACHE_THRESHOLD, default_timeout=LIVE_CACHE_TIMEOUT)
+    return _cache
+
+def _set_state(run_id, **state):
+    # the state is written by one process at a time: the web worker until the run starts
+    # and once its process died, the run's process in between
+    cache = get_live_cache()
+    current = cache.get(f"live:{run_id}") or {}
+    current.update(state)
+    cache.set(f"live:{run_id}", current)
+
+def _heartbeat(run_id):
+    # kept apart from the state, as both the web worker and the run's process write it
+    get_live_cache().set(f"live:{run_id}:updated", time.time())
+
+def _heartbeat_loop():
+    # refresh the runs still waiting in the pool, so that they go stale if this worker stops
+    while True:
+        time.sleep(LIVE_RUN_STALE/4)
+        with _lock:
+            run_ids = list(_active)
+        for run_id in run_ids:
+            _heartbeat(run_id)
+
+def _run_done(run_id, future):
+    with _lock:
+        _active.discard(run_id)
+    # the run reports its own errors, an exception here means its process died (e.g. out of memory)
+    if not future.cancelled() and future.exception() is not None:
+        _set_state(run_id, status='failed', error=repr(future.exception()))
+
+def _run(run_id, scenario):
+    # runs in a pool process
+    from models.simulation import run_scenario, compute_kpis
+    from models.surrogate import update_surrogate
+    cache = get_live_cache()
+    start_datetime = datetime.strptime(scenario['start_date'], "%Y-%m-%d")
+    n_updates = 0
+    def publisher(update):
+        nonlocal n_updates
+        update['Time'] = [(start_datetime+timedelta(hours=b*update['resolution'])).isoformat() 
+                          for b in range(update['start'], update['stop'])]
+        cache.set(f"live:{run_id}:{n_updates}", update)
+        n_updates += 1
+        _set_state(run_id, updates=n_updates)
+        _heartbeat(run_id)
+        return bool(cache.get(f"live:{run_id}:abort"))
+    _heartbeat(run_id)
+    try:
+        result = run_scenario(scenario, publisher=publisher)
+        if result['aborted']:
+            _set_state(run_id, status='aborted')
+        else:
+            _set_state(run_id, status='done', result_id=save_result(result), summary=result['summary'])
+    except Exception as err:
+        _set_state(run_id, status='failed', error=repr(err))
+        return
+    finally:
+        cache.delete(f"live:{run_id}:abort")
+    if result['aborted']:
+        return
+    # the run is saved and reported as done, a failure to learn from it must not change that
+    try:
+        update_surrogate(scenario, compute_kpis(result['summary']))
+    except Exception:
+        _logger.exception("Could not update the surrogate with run %s", run_id)
+
+def start_live_run(scenario):
+    """
+    Start a simulation in the background.
+    ===========
+    ARGUMENTS:
+    ===========
+    - scenario: dict
+        Validated scenario, see models.simulation.validate_scenario.
+    ============
+    RETURNS:
+    ============
+    - run_id: str
+        Id of the run.
+    ============
+    """
+    global _heartbeat_thread
+    run_id = uuid.uuid4().hex
+    _set_state(run_id, status='running', updates=0)
+    _heartbeat(run_id)
+    with _lock:
+        _active.add(run_id)
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="live-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+    try:
+        try:
+            future = _get_executor().submit(_run, run_id, scenario)
+        except BrokenProcessPool:
+            future = _get_executor(replace=True).submit(_run, run_id, scenario)
+    except Exception as err:
+        with _lock:
+            _active.discard(run_id)
+        _set_state(run_id, status='failed', error=repr(err))
+    else:
+        future.add_done_callback(lambda future: _run_done(run_id, future))
+    return run_id
+
+def read_live_run(run_id, offset=0):
+    """
+    Read the state of a run and the updates published since offset.
+    ===========
+    ARGUMENTS:
+    ===========
+    - run_id: str
+        Id returned by start_live_run.
+    ============
+    OPTIONAL:
+    ============
+    - offset: int
+        Number of updates already read. Default is 0.
+    ============
+    RETURNS:
+    ============
+    - state: dict
+        'status' ('running', 'done', 'aborted', 'failed' or 'unknown'), 'updates' (total number of 
+        updates) and, when done, 'result_id' and 'summary'. A run without heartbeat for LIVE_RUN_STALE 
+        seconds is reported as failed.
+    - updates: list
+        Updates published since offset, see EDSimulation.publish_partial_results. 
+        They are deleted from the cache once read.
+    ============
+    """
+    cache = get_live_cache()
+    state = cache.get(f"live:{run_id}") or {'status': 'unknown', 'updates': 0}
+    updated = cache.get(f"live:{run_id}:updated") or 0
+    if state['status'] == 'running' and time.time() - updated > LIVE_RUN_STALE:
+        state = {**state, 'status': 'failed', 'error': "The process running the simulation stopped."}
+        cache.set(f"live:{run_id}", state)
+    keys = [f"live:{run_id}:{ii}" for ii in range(offset, state['updates'])]
+    updates = [cache.get(key) for key in keys]
+    cache.delete_many(*keys)
+    return state, [update for update in updates if update is not None]
+
+def abort_live_run(run_id):
+    """
+    Ask a running simulation to stop at its next update.
+    """
+    get_live_cache().set(f"live:{run_id}:abort", True)
@@ -0,0 +1,69 @@
+'''
+Server-side storage of simulation results.
+Results are kept in a file-system cache shared by all WSGI workers, and only
+their ids travel through dcc.Store, so the browser never receives the full
+hourly series unless a detailed panel is rendered.
+'''
+import os
+import tempfile
+import uuid
+
+CACHE_DIR = os.environ.get("ED_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ed_simulation_cache"))
+# Maximum number of stored results before the oldest are evicted
+CACHE_THRESHOLD = int(os.environ.get("ED_CACHE_THRESHOLD", 1000))
+# Seconds a result is kept. 0 keeps it until evicted by the threshold
+CACHE_TIMEOUT = int(os.environ.get("ED_CACHE_TIMEOUT", 24*3600))
+
+_cache = None
+
+def get_cache():
+    """
+    Return the result cache, creating it on first use.
+    ============
+    RETURNS:
+    ============
+    - cache: cachelib.FileSystemCache
+        Cache shared by every process using the same CACHE_DIR.
+    ============
+    """
+    global _cache
+    if _cache is None:
+        from cachelib import FileSystemCache
+        _cache = FileSystemCache(CACHE_DIR, threshold=CACHE_THRESHOLD, default_timeout=CACHE_TIMEOUT)
+    return _cache
+
+def save_result(result):
+    """
+    Store a simulation result and return its id.
+    ===========
+    ARGUMENTS:
+    ===========
+    - result: dict
+        Simulation result, as returned by models.simulation.run_simulation.
+    ============
+    RETURNS:
+    ============
+    - result_id: str
+        Key under which the result was stored.
+    ============
+    """
+    result_id = uuid.uuid4().hex
+    get_cache().set(result_id, result)
+    return result_id
+
+def load_result(result_id):
+    """
+    Load a stored simulation result.
+    ===========
+    ARGUMENTS:
+    ===========
+    - result_id: str
+        Id returned by save_result.
+    ============
+    RETURNS:
+    ============
+    - result: dict or None
+        The stored result, or None if it expired or was evicted.
+    ============
+    """
+    return get_cache().get(result_id)
@@ -1,32 +1,202 @@
-import time
-import pandas as pd
 from datetime import datetime
-from models.simulation_app import AppSimulation
+from utils.ref_parameters import ACUITIES, SIMULATION_PARAMETERS, SIMULATION_PARAMETERS_ACUITY
 
-def run_simulation(data_dict):
-    ACUITIES = ['Major', 'Minor', 'Resus']
-    LENGTH_OF_STAY = {}
-    ARRIVALS_BEFORE_9 = {}
-    ARRIVALS_AFTER_9 = {}
-    NUM_BEDS = {}
-    for acuity, dic in zip(ACUITIES, data_dict[4:]):
-        LENGTH_OF_STAY[acuity] = dic['length_of_stay']
-        ARRIVALS_BEFORE_9[acuity] = dic['arrivals_before_9']
-        ARRIVALS_AFTER_9[acuity] = dic['arrivals_after_9']
-        NUM_BEDS[acuity] = dic['number_of_available_beds']
-    SIMULATION_DURATION = data_dict[0]['value'] * 24  # Total simulation time in hours
-    MIN_PATIENCE_MINOR = data_dict[1]['value']
-    MAX_PATIENCE_MINOR = data_dict[2]['value']
-    start_datetime = datetime.strptime(data_dict[3]['value'], "%Y-%m-%d")
+ACUITY_PARAMETERS = [key.lower().replace(' ', '_') for key in SIMULATION_PARAMETERS_ACUITY.keys()]
+# Names of the simulation parameters in a scenario, and the table property they come from
+SCENARIO_PARAMETERS = {'duration_days': "SIMULATION DURATION (DAYS)",
+                       'min_patience_minor': "MIN PATIENCE MINOR",
+                       'max_patience_minor': "MAX PATIENCE MINOR",
+                       'start_date': "START DATE"}
+# Options of the simulation engine that are not in the tables, with their defaults
+ENGINE_OPTIONS = {'continuous': False, 'resolution_minutes': 60, 'los_distribution': None, 'los_cv': None}
+LOS_DISTRIBUTIONS = ['poisson', 'lognormal', 'gamma']
+# Bounds of the scenarios accepted by validate_scenario, so that a single run stays within
+# the memory and time of a worker: the series and patient data are allocated as the run goes
+MAX_DURATION_DAYS = 366
+MAX_ARRIVALS_PER_HOUR = 100
+MAX_EXPECTED_PATIENTS = 1_000_000
+
+def default_scenario():
+    """
+    Scenario with the default parameters of the app's tables.
+    """
+    scenario = {name: SIMULATION_PARAMETERS[prop] for name, prop in SCENARIO_PARAMETERS.items() if prop in SIMULATION_PARAMETERS}
+    scenario['start_date'] = "2024-01-01"
+    scenario['acuities'] = {acuity: {param: SIMULATION_PARAMETERS_ACUITY[key][acuity] 
+                                     for param, key in zip(ACUITY_PARAMETERS, SIMULATION_PARAMETERS_ACUITY.keys())} 
+                            for acuity in ACUITIES}
+    scenario.update(ENGINE_OPTIONS)
+    return scenario
+
+def scenario_from_rows(data_dict):
+    """
+    Convert the rows of the parameter tables to a scenario.
+    ===========
+    ARGUMENTS:
+    ===========
+    - data_dict: list
+        Rows of the simulation parameters table (with 'property' and 'value', including 'START DATE')
+        followed by the rows of the acuity parameters table (with 'acuity').
+    ============
+    RETURNS:
+    ============
+    - scenario: dict
+        Parameters of the simulation by name, see validate_scenario.
+    ============
+    """
+    values = {row['property']: row['value'] for row in data_dict if 'property' in row}
+    scenario = {name: values[prop] for name, prop in SCENARIO_PARAMETERS.items()}
+    scenario.update(ENGINE_OPTIONS)
+    scenario['acuities'] = {row['acuity']: {param: row[param] for param in ACUITY_PARAMETERS} 
+                            for row in data_dict if 'acuity' in row}
+    return scenario
+
+def validate_scenario(scenario):
+    """
+    Check a scenario and fill the parameters it does not give with the defaults.
+    ===========
+    ARGUMENTS:
+    ===========
+    - scenario: dict
+        'duration_days', 'min_patience_minor', 'max_patience_minor', 'start_date' (YYYY-MM-DD) and 
+        'acuities', with the 'length_of_stay', 'arrivals_before_9', 'arrivals_after_9' and 
+        'number_of_available_beds' of each acuity level. Optionally, 'continuous' (run in continuous time),
+        'resolution_minutes' (width of the bins of the results, a divisor of a day), 'los_distribution' 
+        ('poisson', 'lognormal' or 'gamma') and 'los_cv' (coefficient of variation of the lengths of stay).
+    ============
+    RETURNS:
+    ============
+    - scenario: dict
+        Complete scenario.
+    ============
+    RAISES:
+    ============
+    - ValueError
+        If a parameter is unknown or has an invalid value, or the scenario is larger than 
+        MAX_DURATION_DAYS, MAX_ARRIVALS_PER_HOUR or MAX_EXPECTED_PATIENTS allow.
+    ============
+    """
+    if not isinstance(scenario, dict):
+        raise ValueError("A scenario must be a JSON object.")
+    defaults = default_scenario()
+    unknown = set(scenario) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}.")
+    complete = {**defaults, **{key: value for key, value in scenario.items() if key != 'acuities'}}
+    acuities = scenario.get('acuities', {})
+    if not isinstance(acuities, dict) or set(acuities) - set(ACUITIES):
+        raise ValueError(f"'acuities' must be an object with keys among {', '.join(ACUITIES)}.")
+    for acuity, params in acuities.items():
+        if not isinstance(params, dict) or set(params) - set(ACUITY_PARAMETERS):
+            raise ValueError(f"Parameters of {acuity} must be an object with keys among {', '.join(ACUITY_PARAMETERS)}.")
+        complete['acuities'][acuity].update(params)
+    numbers = [('duration_days', complete['duration_days']), 
+               ('min_patience_minor', complete['min_patience_minor']), 
+               ('max_patience_minor', complete['max_patience_minor'])]
+    numbers += [(f'{acuity}.{param}', value) for acuity, params in complete['acuities'].items() for param, value in params.items()]
+    for name, value in numbers:
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"'{name}' must be a non-negative number.")
+    if not isinstance(complete['duration_days'], int) or not 1 <= complete['duration_days'] <= MAX_DURATION_DAYS:
+        raise ValueError(f"'duration_days' must be an integer between 1 and {MAX_DURATION_DAYS}.")
+    for acuity, params in complete['acuities'].items():
+        beds = params['number_of_available_beds']
+        if not (isinstance(beds, int) or float(beds).is_integer()) or beds < 1:
+            raise ValueError(f"'{acuity}.number_of_available_beds' must be a positive integer.")
+        params['number_of_available_beds'] = int(beds)
+        for param in ('arrivals_before_9', 'arrivals_after_9'):
+            if params[param] > MAX_ARRIVALS_PER_HOUR:
+                raise ValueError(f"'{acuity}.{param}' must be at most {MAX_ARRIVALS_PER_HOUR} patients per hour.")
+    # arrivals before 9am cover 10 hours of each day, see EDSimulation.patient_arrival
+    expected_patients = complete['duration_days']*sum(10*params['arrivals_before_9'] + 14*params['arrivals_after_9'] 
+                                                      for params in complete['acuities'].values())
+    if expected_patients > MAX_EXPECTED_PATIENTS:
+        raise ValueError(f"The scenario would simulate about {expected_patients:.0f} patients, at most "
+                         f"{MAX_EXPECTED_PATIENTS} are allowed. Shorten it or lower the arrival rates.")
+    if complete['min_patience_minor'] > complete['max_patience_minor']:
+        raise ValueError("'min_patience_minor' must not be larger than 'max_patience_minor'.")
+    try:
+        datetime.strptime(complete['start_date'], "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError("'start_date' must be a date formatted as YYYY-MM-DD.")
+    if not isinstance(complete['continuous'], bool):
+        raise ValueError("'continuous' must be true or false.")
+    resolution = complete['resolution_minutes']
+    if isinstance(resolution, bool) or not isinstance(resolution, int) or resolution < 1 or 1440 % resolution:
+        raise ValueError("'resolution_minutes' must be a whole number of minutes that divides a day.")
+    if complete['los_distribution'] not in LOS_DISTRIBUTIONS + [None]:
+        raise ValueError(f"'los_distribution' must be one of {', '.join(LOS_DISTRIBUTIONS)}.")
+    los_cv = complete['los_cv']
+    if los_cv is not None and (isinstance(los_cv, bool) or not isinstance(los_cv, (int, float)) or los_cv <= 0):
+        raise ValueError("'los_cv' must be a positive number.")
+    return complete
+
+def run_scenario(scenario, publisher=None):
+    """
+    Run a simulation.
+    ===========
+    ARGUMENTS:
+    ===========
+    - scenario: dict
+        Parameters of the simulation, see validate_scenario.
+    ============
+    OPTIONAL:
+    ============
+    - publisher: callable
+        Called with partial results while the simulation runs, see EDSimulation.publish_partial_results.
+        Default is None.
+    ============
+    RETURNS:
+    ============
+    - result: dict
+        'data' (long-format output for plotting), 'summary' (summary statistics) and 'aborted'.
+    ============
+    """
+    # imported here so that the engine (simpy, pandas, tqdm) is only loaded by
+    # the worker that actually runs a simulation
+    from models.simulation_app import AppSimulation
+    acuities = scenario['acuities']
     simulation = AppSimulation(
-    LENGTH_OF_STAY,
-    ARRIVALS_BEFORE_9,
-    ARRIVALS_AFTER_9,
-    SIMULATION_DURATION,
-    MIN_PATIENCE_MINOR,
-    MAX_PATIENCE_MINOR,
-    start_datetime = start_datetime
+    {acuity: params['length_of_stay'] for acuity, params in acuities.items()},
+    {acuity: params['arrivals_before_9'] for acuity, params in acuities.items()},
+    {acuity: params['arrivals_after_9'] for acuity, params in acuities.items()},
+    scenario['duration_days'] * 24,  # Total simulation time in hours
+    scenario['min_patience_minor'],
+    scenario['max_patience_minor'],
+    start_datetime = datetime.strptime(scenario['start_date'], "%Y-%m-%d"),
+    publisher = publisher,
+    show_progress = False,
+    continuous = scenario['continuous'],
+    resolution = scenario['resolution_minutes']/60,
+    los_distribution = scenario['los_distribution'],
+    los_cv = scenario['los_cv']
     )
-    patient_data = simulation.run_simulation(NUM_BEDS)
+    patient_data = simulation.run_simulation({acuity: params['number_of_available_beds'] for acuity, params in acuities.items()})
     output = simulation.prepare_output_dict()
-    return output
\ No newline at end of file
+    summary = simulation.summary_statistics()
+    return {'data': output, 'summary': summary, 'aborted': simulation.aborted}
+
+def run_simulation(data_dict, publisher=None):
+    """
+    Run a simulation from the rows of the parameter tables, see scenario_from_rows and run_scenario.
+    """
+    return run_scenario(scenario_from_rows(data_dict), publisher=publisher)
+
+def compute_kpis(summary):
+    """
+    Reduce the summary statistics of a simulation to the mean of each property 
+    per acuity, used to compare many simulations in a single figure.
+    ===========
+    ARGUMENTS:
+    ===========
+    - summary: dict
+        Summary statistics, as returned by EDSimulation.summary_statistics.
+    ============
+    RETURNS:
+    ============
+    - kpis: dict
+        Mean value for each property and acuity, {property: {acuity: mean}}.
+    ============
+    """
+    return {prop: {acuity: stats['mean'] for acuity, stats in acuity_stats.items()} 
+            for prop, acuity_stats in summary.items()}
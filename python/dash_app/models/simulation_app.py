@@ -16,7 +16,6 @@ from python.simulation_base import EDSimulation
 import numpy as np
 import pandas as pd
 import simpy
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import random
 from tqdm import tqdm
@@ -91,9 +90,9 @@ class AppSimulation(EDSimulation):
         
         env.process(self.patient_arrival(env,resources))
         env.process(self.collect_data(env, resources))
-        [env.run(until=i) for i in tqdm(range(1,self.SIMULATION_DURATION), desc="Running Simulation")]
+        self.run_environment(env)
         
-        return pd.DataFrame(self.patient_data)
+        return self.patient_data.to_dataframe()
         
     def prepare_output_dict(self,):
         """
@@ -105,13 +104,10 @@ class AppSimulation(EDSimulation):
             Dictionary with simulation data processed for plotting.
         ============
         """
-        x = [(self.start_datetime+timedelta(hours=i)) for i in range(self.SIMULATION_DURATION)]
-        average_wait_time = self.calculate_average_wait_time(self.patient_data)
-        average_wait_time = {k:list(v) for k,v in average_wait_time.items()}
-        len_dif = {acuity:len(average_wait_time[acuity])-len(x) for acuity in self.acuities}
-        for acuity,lds in len_dif.items():
-            if lds!=0:
-                average_wait_time[acuity] += abs(lds)*[None]
+        x = [(self.start_datetime+timedelta(hours=i*self.resolution)) for i in range(self.n_bins)]
+        # one value per bin up to the last arrival, padded with None so every value stays at its own time
+        average_wait_time = {acuity: list(values[:len(x)]) + (len(x)-len(values))*[None] 
+                             for acuity, values in self.calculate_hourly_wait_time().items()}
         DATA = {'Bed Usage':self.bed_usage, 
                 'Queue Lengths':self.queue_lengths, 
                 'Total Occupancy':self.total_occupancy, 
@@ -0,0 +1,318 @@
+'''
+Gaussian process surrogate of the simulation, for instant what-if estimates.
+The surrogate maps the acuity parameters, number of beds, duration and patience
+of Minor patients to the mean KPIs of a simulation (see models.simulation.compute_kpis).
+It is trained on the results of the app and of the HTTP API, updated as new results
+arrive and persisted to disk, so every WSGI worker uses the same model. Only runs
+with the engine options of the app (hourly, Poisson lengths of stay) are learned.
+'''
+import os
+import tempfile
+import threading
+import numpy as np
+from utils.ref_parameters import ACUITIES
+from models.simulation import ENGINE_OPTIONS, SCENARIO_PARAMETERS
+
+SURROGATE_PATH = os.environ.get("ED_SURROGATE_PATH", os.path.join(tempfile.gettempdir(), "ed_simulation_surrogate.npz"))
+ACUITY_FEATURES = ['length_of_stay', 'arrivals_before_9', 'arrivals_after_9', 'number_of_available_beds']
+# the mean KPIs depend on the duration, as every run starts with an empty department
+FEATURES = [f'{feature}|{acuity}' for feature in ACUITY_FEATURES for acuity in ACUITIES] + \
+           ['SIMULATION DURATION (DAYS)', 'MIN PATIENCE MINOR', 'MAX PATIENCE MINOR']
+KPIS = [f'{prop}|{acuity}' for prop in ['Bed Usage', 'Queue Lengths', 'Total Occupancy', 'Average Wait Time'] for acuity in ACUITIES]
+# Minimum number of results before predictions are made
+MIN_TRAINING = 10
+# Hyperparameters are re-optimized after this many new results, otherwise only the factorization is updated
+REOPTIMIZE_EVERY = 20
+# Number of most recent results the surrogate is trained on, which bounds the cost of a fit
+MAX_TRAINING = 300
+# Queries further than this from the training bounds (in units of the training range) are outside the trained region
+DOMAIN_MARGIN = 0.05
+# Queries whose predictive std exceeds this fraction of the prior std are outside the trained region
+MAX_RELATIVE_STD = 0.5
+
+def features_from_scenario(scenario):
+    """
+    Build the surrogate input from a scenario (see models.simulation.validate_scenario).
+    ===========
+    ARGUMENTS:
+    ===========
+    - scenario: dict
+        Parameters of the simulation.
+    ============
+    RETURNS:
+    ============
+    - x: numpy.ndarray
+        Input vector, in the order of FEATURES.
+    ============
+    """
+    values = {prop: scenario[name] for name, prop in SCENARIO_PARAMETERS.items()}
+    values.update({f'{feature}|{acuity}': params[feature] for acuity, params in scenario['acuities'].items() 
+                   for feature in ACUITY_FEATURES})
+    return np.array([float(values[feature]) for feature in FEATURES])
+
+def features_from_rows(rows, rows_acuity):
+    """
+    Build the surrogate input from the rows of the parameter tables, see features_from_scenario.
+    """
+    values = {row['property']: row['value'] for row in rows}
+    values.update({f'{feature}|{row["acuity"]}': row[feature] for row in rows_acuity for feature in ACUITY_FEATURES})
+    return np.array([float(values[feature]) for feature in FEATURES])
+
+def outputs_from_kpis(kpis):
+    """
+    Build the surrogate output from the KPIs of a simulation (see models.simulation.compute_kpis).
+    """
+    return np.array([kpis[prop][acuity] for prop, acuity in (kpi.split('|') for kpi in KPIS)], dtype=float)
+
+class SurrogateModel:
+    """
+    Gaussian process regression with a squared exponential kernel (one length scale per input)
+    and Gaussian noise. All KPIs share the kernel, so a prediction costs one kernel vector and
+    a triangular solve, whatever the number of KPIs. New results extend the Cholesky factor of the
+    kernel matrix by one row; only every REOPTIMIZE_EVERY results, or when the oldest result is 
+    dropped beyond MAX_TRAINING, is the model fitted again.
+    =================
+    """
+    def __init__(self, X=None, Y=None, log_params=None, n_since_optimization=0, state=None):
+        """
+        Create a surrogate from training data.
+        ============
+        OPTIONAL:
+        ============
+        - X: numpy.ndarray
+            Training inputs, shape (n, len(FEATURES)). Only the last MAX_TRAINING are kept. Default is no data.
+        - Y: numpy.ndarray
+            Training outputs, shape (n, len(KPIS)). Default is no data.
+        - log_params: numpy.ndarray
+            Log of the length scales, signal variance and noise variance. Default is None (optimized on fit).
+        - n_since_optimization: int
+            Results added since the hyperparameters were last optimized. Default is 0.
+        - state: dict
+            Normalization and Cholesky factor of a fitted model with these data and log_params (see save),
+            used instead of fitting again. Default is None.
+        ============
+        """
+        self.X = np.empty((0, len(FEATURES))) if X is None else np.asarray(X, dtype=float)[-MAX_TRAINING:]
+        self.Y = np.empty((0, len(KPIS))) if Y is None else np.asarray(Y, dtype=float)[-MAX_TRAINING:]
+        self.log_params = log_params
+        self.n_since_optimization = n_since_optimization
+        self.trained = False
+        if state is not None and log_params is not None and len(state['L']) == len(self.X) >= MIN_TRAINING:
+            self.x_min, self.x_range = state['x_min'], state['x_range']
+            self.y_mean, self.y_std = state['y_mean'], state['y_std']
+            self._set_factor(state['L'])
+        elif len(self.X) >= MIN_TRAINING:
+            self.fit(optimize=log_params is None)
+            
+    def _normalize(self, X):
+        return (X - self.x_min)/self.x_range
+    
+    def _normalize_outputs(self, Y):
+        # KPIs are non-negative and queue lengths grow steeply near capacity, so they are modelled on a log scale
+        return (np.log1p(np.maximum(Y, 0.)) - self.y_mean)/self.y_std
+    
+    def _kernel(self, A, B, log_params):
+        length_scales = np.exp(log_params[:-2])
+        sq_dist = (((A[:, None, :] - B[None, :, :])/length_scales)**2).sum(-1)
+        return np.exp(log_params[-2])*np.exp(-0.5*sq_dist)
+    
+    def _negative_log_likelihood(self, log_params, X, Y):
+        # negative log marginal likelihood of the outputs and its gradient with respect to log_params,
+        # dNLL/dp = tr(W dK/dp)/2 with W = m K^-1 - alpha alpha^T for m outputs
+        from scipy.linalg import cholesky, cho_solve
+        n, m = Y.shape
+        scaled_sq_diff = ((X[:, None, :] - X[None, :, :])/np.exp(log_params[:-2]))**2
+        K_signal = np.exp(log_params[-2])*np.exp(-0.5*scaled_sq_diff.sum(-1))
+        noise = np.exp(log_params[-1])
+        try:
+            L = cholesky(K_signal + (noise + 1e-8)*np.eye(n), lower=True)
+        except np.linalg.LinAlgError:
+            return np.inf, np.zeros_like(log_params)
+        alpha = cho_solve((L, True), Y)
+        nll = 0.5*(Y*alpha).sum() + m*np.log(np.diag(L)).sum()
+        W = m*cho_solve((L, True), np.eye(n)) - alpha @ alpha.T
+        WK = W*K_signal
+        gradient = np.r_[0.5*np.einsum('ij,ijd->d', WK, scaled_sq_diff), 0.5*WK.sum(), 0.5*noise*np.trace(W)]
+        return nll, gradient
+    
+    def fit(self, optimize=True):
+        """
+        Fit the Gaussian process to the training data.
+        ============
+        OPTIONAL:
+        ============
+        - optimize: bool
+            Optimize the hyperparameters by maximum likelihood. Default is True.
+        ============
+        """
+        self.x_min = self.X.min(0)
+        self.x_range = np.where(self.X.max(0) > self.x_min, self.X.max(0) - self.x_min, 1.)
+        log_Y = np.log1p(np.maximum(self.Y, 0.))
+        self.y_mean = log_Y.mean(0)
+        self.y_std = np.where(log_Y.std(0) > 0, log_Y.std(0), 1.)
+        X = self._normalize(self.X)
+        Y = self._normalize_outputs(self.Y)
+        if optimize or self.log_params is None:
+            from scipy.optimize import minimize
+            # start from the current hyperparameters, which are usually close to the optimum
+            initial = np.r_[np.zeros(X.shape[1]), 0., np.log(1e-2)] if self.log_params is None else self.log_params
+            bounds = [(np.log(1e-2), np.log(1e2))]*X.shape[1] + [(np.log(1e-2), np.log(1e2)), (np.log(1e-6), np.log(1.))]
+            result = minimize(self._negative_log_likelihood, np.clip(initial, *np.array(bounds).T), args=(X, Y), 
+                              jac=True, method='L-BFGS-B', bounds=bounds)
+            self.log_params = result.x
+            self.n_since_optimization = 0
+        from scipy.linalg import cholesky
+        K = self._kernel(X, X, self.log_params) + (np.exp(self.log_params[-1]) + 1e-8)*np.eye(len(X))
+        self._set_factor(cholesky(K, lower=True))
+        
+    def _set_factor(self, L):
+        # derived quantities of the Cholesky factor L of the kernel matrix of the training data
+        from scipy.linalg import cho_solve
+        self.L = L
+        self.X_normalized = self._normalize(self.X)
+        self.alpha = cho_solve((L, True), self._normalize_outputs(self.Y))
+        self.length_scales = np.exp(self.log_params[:-2])
+        self.signal_variance = np.exp(self.log_params[-2])
+        self.x_lower, self.x_upper = self.X.min(0), self.X.max(0)
+        self.trained = True
+        
+    def add(self, x, y):
+        """
+        Add a simulation result to the training data and update the fit, dropping the oldest 
+        result beyond MAX_TRAINING.
+        ===========
+        ARGUMENTS:
+        ===========
+        - x: numpy.ndarray
+            Input vector (see features_from_rows).
+        - y: numpy.ndarray
+            Output vector (see outputs_from_kpis).
+        ============
+        """
+        dropped = len(self.X) >= MAX_TRAINING
+        self.X = np.vstack([self.X, x])[-MAX_TRAINING:]
+        self.Y = np.vstack([self.Y, y])[-MAX_TRAINING:]
+        self.n_since_optimization += 1
+        if len(self.X) < MIN_TRAINING:
+            return
+        if not self.trained or dropped or self.n_since_optimization >= REOPTIMIZE_EVERY:
+            self.fit(optimize=not self.trained or self.n_since_optimization >= REOPTIMIZE_EVERY)
+            return
+        # extend the factorization by the new row, with the normalization of the last fit
+        from scipy.linalg import solve_triangular
+        k = self._kernel(self.X_normalized, self._normalize(np.asarray(x, dtype=float))[None, :], self.log_params)[:, 0]
+        l = solve_triangular(self.L, k, lower=True)
+        n = len(l)
+        L = np.zeros((n+1, n+1))
+        L[:n, :n] = self.L
+        L[n, :n] = l
+        L[n, n] = np.sqrt(max(self.signal_variance + np.exp(self.log_params[-1]) + 1e-8 - l @ l, 1e-12))
+        self._set_factor(L)
+            
+    def predict(self, x):
+        """
+        Predict the KPIs of a simulation.
+        ===========
+        ARGUMENTS:
+        ===========
+        - x: numpy.ndarray
+            Input vector (see features_from_rows).
+        ============
+        RETURNS:
+        ============
+        - mean: numpy.ndarray
+            Predicted KPIs, in the order of KPIS.
+        - std: numpy.ndarray
+            Standard deviation of the prediction of each KPI (first order approximation from the log scale).
+        - in_domain: bool
+            False if the input is outside the trained region, in which case the prediction 
+            should not be trusted and the simulation should be run instead.
+        ============
+        """
+        from scipy.linalg import solve_triangular
+        x = np.asarray(x, dtype=float)
+        z = self._normalize(x)
+        k = self.signal_variance*np.exp(-0.5*(((self.X_normalized - z)/self.length_scales)**2).sum(1))
+        mean = k @ self.alpha
+        v = solve_triangular(self.L, k, lower=True)
+        variance = max(self.signal_variance - v @ v, 0.)
+        # position in the range of the training data, whose bounds may have grown since the last fit
+        u = (x - self.x_lower)/np.where(self.x_upper > self.x_lower, self.x_upper - self.x_lower, 1.)
+        in_domain = (bool(np.all((u >= -DOMAIN_MARGIN) & (u <= 1 + DOMAIN_MARGIN))) 
+                     and np.sqrt(variance/self.signal_variance) <= MAX_RELATIVE_STD)
+        log_mean = self.y_mean + mean*self.y_std
+        return np.expm1(log_mean), np.exp(log_mean)*np.sqrt(variance)*self.y_std, in_domain
+    
+    def save(self, filepath=SURROGATE_PATH):
+        """
+        Save the training data, hyperparameters and factorization, replacing the file atomically.
+        """
+        tmp_path = filepath + ".tmp.npz"
+        state = {name: getattr(self, name) for name in ['x_min', 'x_range', 'y_mean', 'y_std', 'L']} if self.trained else {}
+        np.savez(tmp_path, X=self.X, Y=self.Y, 
+                 log_params=np.array([]) if self.log_params is None else self.log_params,
+                 n_since_optimization=self.n_since_optimization, **state)
+        os.replace(tmp_path, filepath)
+        
+    @classmethod
+    def load(cls, filepath=SURROGATE_PATH):
+        """
+        Load a saved surrogate, without fitting it again. Return an empty one if the file does not exist
+        or was saved with other FEATURES.
+        """
+        if not os.path.exists(filepath):
+            return cls()
+        with np.load(filepath) as data:
+            if data['X'].shape[1:] != (len(FEATURES),):
+                return cls()
+            log_params = data['log_params'] if data['log_params'].size else None
+            state = {name: data[name] for name in ['x_min', 'x_range', 'y_mean', 'y_std', 'L']} if 'L' in data else None
+            return cls(data['X'], data['Y'], log_params, int(data['n_since_optimization']), state)
+
+_surrogate = None
+_surrogate_mtime = None
+
+def get_surrogate():
+    """
+    Return the saved surrogate, reloading it if another process updated it.
+    """
+    global _surrogate, _surrogate_mtime
+    mtime = os.path.getmtime(SURROGATE_PATH) if os.path.exists(SURROGATE_PATH) else None
+    if _surrogate is None or mtime != _surrogate_mtime:
+        _surrogate = SurrogateModel.load()
+        _surrogate_mtime = mtime
+    return _surrogate
+
+_update_lock = threading.Lock()
+
+def update_surrogate(scenario, kpis):
+    """
+    Add a simulation result to the saved surrogate.
+    ===========
+    ARGUMENTS:
+    ===========
+    - scenario: dict
+        Parameters of the simulation (see models.simulation.validate_scenario).
+    - kpis: dict
+        KPIs of the simulation (see models.simulation.compute_kpis).
+    ============
+    RETURNS:
+    ============
+    - added: bool
+        False if the result was not learned, because the scenario changes the engine options of the app.
+    ============
+    """
+    if any(scenario.get(option, default) != default for option, default in ENGINE_OPTIONS.items()):
+        return False
+    x, y = features_from_scenario(scenario), outputs_from_kpis(kpis)
+    # serialize updates between threads, and between processes where file locks are available
+    with _update_lock, open(SURROGATE_PATH + ".lock", "w") as lock_file:
+        try:
+            import fcntl
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        except ImportError:
+            pass
+        surrogate = SurrogateModel.load()
+        surrogate.add(x, y)
+        surrogate.save()
+    return True
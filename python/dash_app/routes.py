@@ -0,0 +1,67 @@
+from flask import abort, jsonify, request, send_file
+from utils.report_jobs import report_status, report_path
+from models.simulation import validate_scenario
+from models.batch_jobs import submit_jobs, job_status, job_result, QueueFullError
+
+def register_routes(server):
+
+    @server.route('/report/<job_id>')
+    def get_report_status(job_id):
+        status = report_status(job_id)
+        if status == 'unknown':
+            abort(404)
+        return jsonify({'job_id': job_id, 'status': status, 
+                        'url': f'/report/{job_id}/pdf' if status == 'done' else None})
+
+    @server.route('/report/<job_id>/pdf')
+    def download_report(job_id):
+        if report_status(job_id) != 'done':
+            abort(404)
+        # send_file streams the file from disk in chunks
+        return send_file(report_path(job_id), mimetype='application/pdf', 
+                         as_attachment=True, download_name='simulation_report.pdf')
+
+    @server.route('/api/simulations', methods=['POST'])
+    def submit_simulations():
+        # Accepts a single scenario, or {"scenarios": [...], "timeout": seconds} for a batch
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({'error': 'The request body must be a JSON object.'}), 400
+        batch = 'scenarios' in body
+        scenarios = body['scenarios'] if batch else [body]
+        timeout = body.get('timeout') if batch else None
+        if not isinstance(scenarios, list) or not scenarios:
+            return jsonify({'error': "'scenarios' must be a non-empty list."}), 400
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+            return jsonify({'error': "'timeout' must be a positive number of seconds."}), 400
+        try:
+            scenarios = [validate_scenario(scenario) for scenario in scenarios]
+        except ValueError as err:
+            return jsonify({'error': str(err)}), 400
+        try:
+            job_ids = submit_jobs(scenarios, timeout)
+        except QueueFullError as err:
+            return jsonify({'error': str(err)}), 429, {'Retry-After': '30'}
+        jobs = [{'job_id': job_id, 'status': (job_status(job_id) or {}).get('status', 'queued'), 
+                 'url': f'/api/simulations/{job_id}'} for job_id in job_ids]
+        return jsonify({'jobs': jobs} if batch else jobs[0]), 202
+
+    @server.route('/api/simulations/<job_id>')
+    def get_simulation_status(job_id):
+        status = job_status(job_id)
+        if status is None:
+            abort(404)
+        return jsonify({'job_id': job_id, **status, 
+                        'result_url': f'/api/simulations/{job_id}/result' if status['status'] == 'done' else None})
+
+    @server.route('/api/simulations/<job_id>/result')
+    def get_simulation_result(job_id):
+        status = job_status(job_id)
+        if status is None:
+            abort(404)
+        if status['status'] != 'done':
+            return jsonify({'job_id': job_id, 'status': status['status'], 'error': 'The job has not finished.'}), 409
+        result = job_result(job_id)
+        if result is None:
+            return jsonify({'job_id': job_id, 'error': 'The result is no longer stored.'}), 410
+        return jsonify({'job_id': job_id, **result})
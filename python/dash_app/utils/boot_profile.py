@@ -0,0 +1,65 @@
+'''
+Measure the cost of booting one WSGI worker: wall time to build the app,
+resident memory after boot, and which heavy modules got imported.
+Each measurement runs in a fresh interpreter so results are not skewed by
+modules already loaded in this process.
+
+Usage, from the dash_app directory:
+
+    python utils/boot_profile.py [--repeat 5]
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ["simpy", "pandas", "plotly.express", "matplotlib", "tqdm", "scipy", "prophet"]
+
+PROBE = r'''
+import json, resource, sys, time
+t0 = time.perf_counter()
+from wsgi import server
+boot_time = time.perf_counter() - t0
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+scale = 1 if sys.platform == "darwin" else 1024
+print(json.dumps({
+    "boot_time_s": boot_time,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20,
+    "heavy_modules": [m for m in %r if m in sys.modules],
+}))
+''' % HEAVY_MODULES
+
+def profile_boot(repeat=5):
+    """
+    Boot the app `repeat` times in fresh interpreters.
+    ============
+    OPTIONAL:
+    ============
+    - repeat: int
+        Number of fresh interpreters to boot. Default is 5.
+    ============
+    RETURNS:
+    ============
+    - results: list
+        One dict per boot with boot_time_s, max_rss_mb and heavy_modules.
+    ============
+    """
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE], cwd=app_dir, 
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    results = profile_boot(args.repeat)
+    boot_times = sorted(r["boot_time_s"] for r in results)
+    rss = sorted(r["max_rss_mb"] for r in results)
+    print(f"boot time (median of {len(results)}): {boot_times[len(boot_times)//2]:.3f} s")
+    print(f"max RSS   (median of {len(results)}): {rss[len(rss)//2]:.1f} MB")
+    print(f"heavy modules loaded at boot: {results[-1]['heavy_modules'] or 'none'}")
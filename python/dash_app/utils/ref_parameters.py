@@ -27,3 +27,8 @@ SIMULATION_PARAMETERS = {
     "MIN PATIENCE MINOR": 4,
     "MAX PATIENCE MINOR": 8,
 }
+
+# Maximum number of simulations kept for comparison at once
+MAX_SIMULATIONS = 50
+# Number of detailed simulation panels rendered per page
+SIMULATIONS_PER_PAGE = 3
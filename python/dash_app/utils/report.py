@@ -0,0 +1,131 @@
+'''
+Server-side PDF report of stored simulation results.
+Charts are drawn with matplotlib's PDF backend, so lines and text stay vector
+and the file size depends on the number of points, not on the screen size.
+'''
+from datetime import datetime
+from utils.ref_parameters import ACUITIES
+
+PLOT_KEYS = ['Bed Usage', 'Queue Lengths', 'Total Occupancy', 'Average Wait Time']
+ACUITY_COLORS = {'Major': 'firebrick', 'Minor': 'olivedrab', 'Resus': 'navy'}
+# A4 landscape, in inches
+PAGE_SIZE = (11.69, 8.27)
+
+def _draw_table(ax, cell_text, col_labels, row_labels=None, title=None):
+    ax.axis('off')
+    table = ax.table(cellText=cell_text, colLabels=col_labels, rowLabels=row_labels, loc='upper center', cellLoc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(7)
+    table.scale(1, 1.2)
+    if title is not None:
+        ax.set_title(title, fontsize=9, loc='left')
+
+def _format(value):
+    return '' if value is None else f'{value:.2f}'
+
+def create_comparison_page(simulations):
+    """
+    Figure with the mean of each property per simulation, as in the Comparison tab.
+    ===========
+    ARGUMENTS:
+    ===========
+    - simulations: list
+        Entries of the simulation data store, each with a 'kpis' dict.
+    ============
+    RETURNS:
+    ============
+    - fig: matplotlib.figure.Figure
+    ============
+    """
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=PAGE_SIZE)
+    fig.suptitle('Comparison of simulations')
+    labels = [f'{ii+1}' for ii in range(len(simulations))]
+    axes = fig.subplots(2, 2, sharex=True)
+    for ax, key in zip(axes.flat, PLOT_KEYS):
+        for acuity in ACUITIES:
+            ax.plot(labels, [sim['kpis'][key].get(acuity, float('nan')) for sim in simulations], 
+                    marker='o', label=acuity, color=ACUITY_COLORS[acuity])
+        ax.set_title(f'Mean {key}', fontsize=10)
+        ax.grid(True)
+    for ax in axes[-1]:
+        ax.set_xlabel('Simulation')
+    axes[0][0].legend(title='Acuity', fontsize=8)
+    return fig
+
+def create_simulation_page(label, simulation, result):
+    """
+    Figure with the parameters, summary statistics and time series of one simulation.
+    ===========
+    ARGUMENTS:
+    ===========
+    - label: str
+        Title of the page.
+    - simulation: dict
+        Entry of the simulation data store (parameters of the simulation).
+    - result: dict
+        Stored simulation result, with 'data' and 'summary'.
+    ============
+    RETURNS:
+    ============
+    - fig: matplotlib.figure.Figure
+    ============
+    """
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=PAGE_SIZE)
+    fig.suptitle(label)
+    grid = fig.add_gridspec(4, 2, width_ratios=[1, 1.6], hspace=0.35, wspace=0.15, left=0.17, right=0.97)
+    # parameters and summary tables on the left column
+    rows = simulation['rows']
+    _draw_table(fig.add_subplot(grid[0, 0]), [[str(row['value'])] for row in rows], ['Value'],
+                row_labels=[row['property'].capitalize() for row in rows], title='Selected parameters')
+    acuity_columns = [col for col in simulation['columns_acuity'] if col['id'] != 'acuity']
+    _draw_table(fig.add_subplot(grid[1, 0]), 
+                [[str(row[col['id']]) for row in simulation['rows_acuity']] for col in acuity_columns],
+                [row['acuity'] for row in simulation['rows_acuity']], row_labels=[col['name'].capitalize() for col in acuity_columns])
+    summary = result['summary']
+    stats = ['mean', 'std', 'min', '50%', 'max']
+    ax = fig.add_subplot(grid[2:, 0])
+    _draw_table(ax, [[_format(summary[key][acuity][stat]) for stat in stats] for key in PLOT_KEYS for acuity in ACUITIES],
+                stats, row_labels=[f'{key} ({acuity})' for key in PLOT_KEYS for acuity in ACUITIES], title='Results')
+    # time series on the right column
+    data = result['data']
+    acuity_index = {acuity: [ii for ii, ac in enumerate(data['Acuity']) if ac == acuity] for acuity in ACUITIES}
+    axes = [fig.add_subplot(grid[ii, 1]) for ii in range(len(PLOT_KEYS))]
+    for ax, key in zip(axes, PLOT_KEYS):
+        for acuity, index in acuity_index.items():
+            ax.plot([data['Time'][ii] for ii in index], 
+                    [float('nan') if data[key][ii] is None else data[key][ii] for ii in index],
+                    label=acuity, color=ACUITY_COLORS[acuity], linewidth=0.6)
+        ax.set_ylabel(key, fontsize=8)
+        ax.tick_params(labelsize=7)
+        ax.grid(True)
+        if ax is not axes[-1]:
+            ax.tick_params(labelbottom=False)
+    axes[-1].tick_params(axis='x', labelrotation=30)
+    axes[0].legend(title='Acuity', fontsize=7, title_fontsize=7, ncol=3, loc='lower right', bbox_to_anchor=(1, 1))
+    return fig
+
+def build_report(simulations, results, filepath):
+    """
+    Write a PDF report with a comparison page (if more than one simulation)
+    followed by one page per simulation.
+    ===========
+    ARGUMENTS:
+    ===========
+    - simulations: list
+        Entries of the simulation data store.
+    - results: list
+        Stored result of each simulation, None if no longer available.
+    - filepath: str
+        Path of the PDF file to write.
+    ============
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+    with PdfPages(filepath, metadata={'Title': 'ED Simulation report', 'CreationDate': datetime.now()}) as pdf:
+        if len(simulations) > 1:
+            pdf.savefig(create_comparison_page(simulations))
+        for ii, (simulation, result) in enumerate(zip(simulations, results)):
+            if result is None:
+                continue
+            pdf.savefig(create_simulation_page(f'Simulation {ii+1}', simulation, result))
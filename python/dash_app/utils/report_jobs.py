@@ -0,0 +1,119 @@
+'''
+Background generation of PDF reports.
+Reports are built in a thread pool and written to REPORT_DIR. The state of a
+job is read from the files in that directory, so any WSGI worker can answer
+status and download requests for a job started by another worker. Files older
+than REPORT_MAX_AGE are removed when a new report is submitted.
+'''
+import os
+import re
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+REPORT_DIR = os.environ.get("ED_REPORT_DIR", os.path.join(tempfile.gettempdir(), "ed_simulation_reports"))
+# Reports are CPU bound, a couple of threads per worker is enough
+REPORT_THREADS = int(os.environ.get("ED_REPORT_THREADS", 2))
+# Seconds after which a report still pending is considered failed, e.g. when its worker was recycled
+REPORT_TIMEOUT = float(os.environ.get("ED_REPORT_TIMEOUT", 600))
+# Seconds a report (or its error) is kept
+REPORT_MAX_AGE = float(os.environ.get("ED_REPORT_MAX_AGE", 24*3600))
+
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=REPORT_THREADS, thread_name_prefix="report")
+    return _executor
+
+def _job_path(job_id, extension):
+    if not _JOB_ID.match(job_id):
+        raise ValueError(f"Invalid report id: {job_id}")
+    return os.path.join(REPORT_DIR, job_id+extension)
+
+def report_path(job_id):
+    """
+    Path of the finished PDF of a report job.
+    """
+    return _job_path(job_id, ".pdf")
+
+def _generate_report(job_id, simulations):
+    from models.result_store import load_result
+    from utils.report import build_report
+    try:
+        results = [load_result(sd['result_id']) for sd in simulations]
+        # write to a temporary file first, so a half written PDF is never served
+        tmp_path = _job_path(job_id, ".tmp")
+        build_report(simulations, results, tmp_path)
+        os.replace(tmp_path, report_path(job_id))
+    except Exception as err:
+        with open(_job_path(job_id, ".err"), "w") as f:
+            f.write(repr(err))
+    finally:
+        if os.path.exists(_job_path(job_id, ".pending")):
+            os.remove(_job_path(job_id, ".pending"))
+
+def _remove_expired():
+    now = time.time()
+    for filename in os.listdir(REPORT_DIR):
+        path = os.path.join(REPORT_DIR, filename)
+        try:
+            if now - os.path.getmtime(path) > REPORT_MAX_AGE:
+                os.remove(path)
+        except OSError:
+            # removed by another worker in the meantime
+            pass
+
+def submit_report(simulations):
+    """
+    Start generating a report in the background.
+    ===========
+    ARGUMENTS:
+    ===========
+    - simulations: list
+        Entries of the simulation data store to include in the report.
+    ============
+    RETURNS:
+    ============
+    - job_id: str
+        Id of the report job.
+    ============
+    """
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    _remove_expired()
+    job_id = uuid.uuid4().hex
+    open(_job_path(job_id, ".pending"), "w").close()
+    _get_executor().submit(_generate_report, job_id, simulations)
+    return job_id
+
+def report_status(job_id):
+    """
+    Status of a report job.
+    ===========
+    ARGUMENTS:
+    ===========
+    - job_id: str
+        Id returned by submit_report.
+    ============
+    RETURNS:
+    ============
+    - status: str
+        'done', 'failed', 'pending' or 'unknown'. A report pending for more than REPORT_TIMEOUT 
+        seconds has failed.
+    ============
+    """
+    try:
+        if os.path.exists(report_path(job_id)):
+            return "done"
+        if os.path.exists(_job_path(job_id, ".err")):
+            return "failed"
+        if os.path.exists(_job_path(job_id, ".pending")):
+            if time.time() - os.path.getmtime(_job_path(job_id, ".pending")) > REPORT_TIMEOUT:
+                return "failed"
+            return "pending"
+    except (ValueError, OSError):
+        pass
+    return "unknown"
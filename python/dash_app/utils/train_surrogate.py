@@ -0,0 +1,88 @@
+'''
+Train the what-if surrogate (models/surrogate.py) on a sweep of simulations.
+Parameters are sampled with a Latin hypercube around the defaults of the
+parameter tables, and every simulation result is added to the saved surrogate,
+so the sweep can be run again later to extend it.
+
+Usage, from the repository root:
+
+    python python/dash_app/utils/train_surrogate.py [--samples 50] [--days 30] [--spread 0.5] [--jobs 4]
+'''
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.dirname(APP_DIR)))
+from utils.ref_parameters import ACUITIES, SIMULATION_PARAMETERS, SIMULATION_PARAMETERS_ACUITY
+
+def sample_parameters(n_samples, days=30, spread=0.5, seed=42):
+    """
+    Sample parameter tables with a Latin hypercube, each parameter within +/- spread of its default.
+    ===========
+    ARGUMENTS:
+    ===========
+    - n_samples: int
+        Number of parameter sets.
+    ============
+    OPTIONAL:
+    ============
+    - days: int
+        Simulation duration in days. Default is 30.
+    - spread: float
+        Relative range of each parameter around its default. Default is 0.5.
+    - seed: int
+        Seed of the sampler. Default is 42.
+    ============
+    RETURNS:
+    ============
+    - samples: list
+        Parameter table rows of each sample, as given to models.simulation.run_simulation.
+    ============
+    """
+    from scipy.stats import qmc
+    acuity_keys = list(SIMULATION_PARAMETERS_ACUITY.keys())
+    defaults = [SIMULATION_PARAMETERS_ACUITY[key][acuity] for key in acuity_keys for acuity in ACUITIES] + \
+               [SIMULATION_PARAMETERS["MIN PATIENCE MINOR"], SIMULATION_PARAMETERS["MAX PATIENCE MINOR"]]
+    unit = qmc.LatinHypercube(d=len(defaults), seed=seed).random(n_samples)
+    samples = []
+    for u in unit:
+        values = [max(1, round(default*(1 - spread + 2*spread*ui))) for default, ui in zip(defaults, u)]
+        min_patience, max_patience = sorted(values[-2:])
+        rows = [{'property': "SIMULATION DURATION (DAYS)", 'value': days},
+                {'property': "MIN PATIENCE MINOR", 'value': min_patience},
+                {'property': "MAX PATIENCE MINOR", 'value': max_patience},
+                {'property': "START DATE", 'value': "2024-01-01"}]
+        rows_acuity = [dict(acuity=acuity, **{key.lower().replace(' ', '_'): values[ii*len(ACUITIES)+jj] 
+                                              for ii, key in enumerate(acuity_keys)}) 
+                       for jj, acuity in enumerate(ACUITIES)]
+        samples.append(rows + rows_acuity)
+    return samples
+
+def _simulate(data_dict):
+    from models.simulation import run_simulation, compute_kpis
+    return data_dict, compute_kpis(run_simulation(data_dict)['summary'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--spread", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    import numpy as np
+    from models.surrogate import SurrogateModel, SURROGATE_PATH, features_from_rows, outputs_from_kpis
+    X, Y = [], []
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        for ii, (data_dict, kpis) in enumerate(executor.map(_simulate, sample_parameters(args.samples, args.days, args.spread, args.seed))):
+            X.append(features_from_rows(data_dict[:4], data_dict[4:]))
+            Y.append(outputs_from_kpis(kpis))
+            print(f"Simulation {ii+1}/{args.samples} done", end="\r", flush=True)
+    # add the sweep to the results already in the surrogate, and re-optimize it
+    surrogate = SurrogateModel.load()
+    surrogate = SurrogateModel(np.vstack([surrogate.X] + X), np.vstack([surrogate.Y] + Y))
+    surrogate.save()
+    print(f"\nSurrogate trained on {len(surrogate.X)} simulations, saved to {SURROGATE_PATH}")
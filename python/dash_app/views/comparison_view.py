@@ -0,0 +1,66 @@
+from dash import dcc, html
+from utils.ref_parameters import ACUITIES
+
+ACUITY_COLORS = {'Major': '#636efa', 'Minor': '#EF553B', 'Resus': '#00cc96'}
+
+def create_comparison_view():
+    return html.Div([
+                html.H5('Mean of each property per simulation. Open "Details" for the full time series of each simulation.',
+                        style={'margin': '1%'}),
+                dcc.Graph(id='comparison-graph', style={'height': '600px', 'margin': '0px'}, config={'displayModeBar': True}),
+            ])
+
+def create_comparison_figure(simulations):
+    """
+    Overlay the KPIs of many simulations in one figure, one subplot per property
+    and one trace per acuity. The number of traces does not depend on the number
+    of simulations, so the figure stays cheap to build and render as it grows.
+    ===========
+    ARGUMENTS:
+    ===========
+    - simulations: list
+        Entries of the simulation data store, each with a 'kpis' dict.
+    ============
+    RETURNS:
+    ============
+    - fig: plotly.graph_objects.Figure
+    ============
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    plot_keys = ['Bed Usage', 'Queue Lengths', 'Total Occupancy', 'Average Wait Time']
+    fig = make_subplots(rows=2, cols=2, shared_xaxes=True, 
+                        vertical_spacing=0.08, horizontal_spacing=0.08,
+                        subplot_titles=plot_keys)
+    labels = [f"Simulation {ii+1}" for ii in range(len(simulations))]
+    hover = [' | '.join(f"{row['acuity']}: {row['number_of_available_beds']} beds" for row in sim['rows_acuity']) 
+             for sim in simulations]
+    for ii,key in enumerate(plot_keys):
+        for acuity in ACUITIES:
+            fig.add_trace(go.Scatter(x=labels, 
+                                     y=[sim['kpis'][key].get(acuity) for sim in simulations],
+                                     customdata=hover,
+                                     hovertemplate='%{x}<br>%{customdata}<br>%{y:.2f}',
+                                     mode='lines+markers',
+                                     name=acuity,
+                                     legendgroup=acuity,
+                                     showlegend=ii==0,
+                                     line=dict(color=ACUITY_COLORS[acuity])),
+                          row=ii//2+1, col=ii%2+1)
+    fig.update_layout(
+        legend_title_text="Acuity",
+        legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.05,
+                xanchor="right",
+                x=1,
+        ),
+        margin=dict(
+            t=60,
+            b=1,
+            r=1,
+            l=1
+        ),
+        )
+    return fig
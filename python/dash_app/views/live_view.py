@@ -0,0 +1,65 @@
+from dash import dcc, html
+from utils.ref_parameters import ACUITIES
+
+LIVE_PLOT_KEYS = ['Bed Usage', 'Queue Lengths', 'Wait Time']
+ACUITY_COLORS = {'Major': '#636efa', 'Minor': '#EF553B', 'Resus': '#00cc96'}
+
+def create_live_view():
+    return html.Div([
+                html.Div([
+                    html.H4('Running simulation...', id='live-status', className="text-primary", style={'margin': '0%'}),
+                    html.Button('Abort', id='abort-simulation-button', n_clicks=0, 
+                                style={'margin-left': '5px'}, className="btn btn-danger"),
+                ], style={'display': 'flex', 'flexDirection': 'row', 'justify-content': 'space-between'}),
+                dcc.Graph(id='live-graph', style={'height': '450px', 'margin': '0px'}, config={'displayModeBar': False}),
+                dcc.Interval(id='live-interval', interval=1000, disabled=True),
+                dcc.Store(id='live-run-store'),
+            ], id='live-container', style={'display': 'none', 'margin': '1.5%', 'padding': '1%'}, className='bg-body-tertiary')
+
+def create_live_figure():
+    """
+    Empty figure with one trace per property and acuity, filled with extendData as results arrive.
+    ============
+    RETURNS:
+    ============
+    - fig: plotly.graph_objects.Figure
+    ============
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    fig = make_subplots(rows=len(LIVE_PLOT_KEYS), cols=1, shared_xaxes=True, vertical_spacing=0.03)
+    for ii,key in enumerate(LIVE_PLOT_KEYS):
+        for acuity in ACUITIES:
+            fig.add_trace(go.Scattergl(x=[], y=[], mode='lines', name=acuity, legendgroup=acuity, 
+                                       showlegend=ii==0, line=dict(color=ACUITY_COLORS[acuity])),
+                          row=ii+1, col=1)
+        fig.update_yaxes(title_text=key, row=ii+1, col=1)
+    fig.update_layout(
+        legend_title_text="Acuity",
+        legend=dict(orientation="h", yanchor="bottom", y=1.0, xanchor="right", x=1),
+        margin=dict(t=40, b=1, r=1, l=1),
+        uirevision='live',
+        )
+    return fig
+
+def create_live_extend_data(updates):
+    """
+    Convert published updates to the extendData of the live figure, in the order of its traces.
+    ===========
+    ARGUMENTS:
+    ===========
+    - updates: list
+        Updates published by the simulation, see EDSimulation.publish_partial_results.
+    ============
+    RETURNS:
+    ============
+    - extend_data: tuple
+        New points of every trace and the trace indices, as expected by dcc.Graph extendData.
+    ============
+    """
+    xs, ys = [], []
+    for key in LIVE_PLOT_KEYS:
+        for acuity in ACUITIES:
+            xs.append([t for update in updates for t in update['Time']])
+            ys.append([y for update in updates for y in update[key][acuity]])
+    return dict(x=xs, y=ys), list(range(len(xs)))
@@ -0,0 +1,50 @@
+from dash import html
+import dash_bootstrap_components as dbc
+from views.table_view import create_table_view
+from utils.ref_parameters import ACUITIES
+
+def create_surrogate_view():
+    return html.Div([
+                html.H5('Quick estimate', className="text-primary"),
+                html.Div(id='surrogate-container'),
+            ], style={'margin': '1%'})
+
+def create_surrogate_estimate(kpis, mean, std, in_domain):
+    """
+    Table of the KPIs predicted by the surrogate, with their 95% uncertainty band.
+    ===========
+    ARGUMENTS:
+    ===========
+    - kpis: list
+        Names of the KPIs, as '<property>|<acuity>'.
+    - mean: numpy.ndarray
+        Predicted value of each KPI.
+    - std: numpy.ndarray
+        Standard deviation of the prediction of each KPI.
+    - in_domain: bool
+        Whether the parameters are within the region the surrogate was trained on.
+    ============
+    RETURNS:
+    ============
+    - children: list
+    ============
+    """
+    if not in_domain:
+        return [dbc.Alert('These parameters are outside the range of the simulations run so far, so no quick '
+                          'estimate is available. Press "Add Simulation" to run the simulation.', color="info")]
+    estimates = {}
+    for kpi, m, s in zip(kpis, mean, std):
+        prop, acuity = kpi.split('|')
+        estimates.setdefault(prop, {'property': f'Mean {prop}'})[acuity] = f'{m:.2f} ± {1.96*s:.2f}'
+    columns = [{'name': 'Property', 'id': 'property'}]+[{'name': acuity, 'id': acuity} for acuity in ACUITIES]
+    style_data_conditional=[{
+                'if': {'column_id': 'property'},
+                'fontWeight': 'bold'
+            }]
+    style_table={'overflowX': 'auto',
+                 'font_size': '10pt',
+                 }
+    return [create_table_view('surrogate-estimate-table', columns, list(estimates.values()), 
+                              style_data_conditional=style_data_conditional, style_table=style_table),
+            html.Small('Estimated from previous simulations (95% band). Press "Add Simulation" for the full results.', 
+                       className="text-secondary")]
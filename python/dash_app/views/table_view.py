@@ -2,7 +2,6 @@ from dash import dcc, html, dash_table
 from dash.dash_table.Format import Format, Scheme
 import dash_bootstrap_components as dbc
 from utils.ref_parameters import ACUITIES, SIMULATION_PARAMETERS, SIMULATION_PARAMETERS_ACUITY
-import pandas as pd
 
 def create_table_view(table_id, columns_list, data_list, editable=False, **kwargs):
     return dash_table.DataTable(
@@ -99,19 +98,16 @@ def create_selected_parameters_acuity_table(rows, columns):
                 }
     return create_table_view(id, columns, data, style_data_conditional=style_data_conditional, style_table=style_table, style_data=style_data)
 
-def create_simulation_results_table(simulation_data):
+def create_simulation_results_table(summary):
     id='simulation-results-table'
-    df = pd.DataFrame(simulation_data)
-    desc_df = df.groupby(["Acuity"]).describe()
-    properties = desc_df.columns.get_level_values(0).unique()
     out_tables = []
-    for ii,property in enumerate(properties[:4]):
-        id = id+f'-{ii+1}'
-        columns = [{'name':[property,desc_df[property].index.name], 'id':desc_df[property].index.name}]
-        for col in desc_df[property].columns:
+    for ii,(property, acuity_stats) in enumerate(summary.items()):
+        columns = [{'name':[property,'Acuity'], 'id':'Acuity'}]
+        stat_names = list(next(iter(acuity_stats.values())).keys())
+        for col in stat_names:
             format=Format(precision=2, scheme=Scheme.decimal)
-            columns += [{'name': [property,col], 'id': str(col), 'type':'numeric', 'format':format}]
-        data = [{'Acuity':acuity, **{str(col):desc_df[property][col][acuity] for col in desc_df[property].columns}} for acuity in desc_df[property].index]
+            columns += [{'name': [property,col], 'id': col, 'type':'numeric', 'format':format}]
+        data = [{'Acuity':acuity, **stats} for acuity, stats in acuity_stats.items()]
         style_data_conditional=[{
                     'if': {'column_id': 'ACUITY'},
                     'fontWeight': 'bold'
@@ -125,5 +121,5 @@ def create_simulation_results_table(simulation_data):
                     'whiteSpace': 'normal',
                     'height': 'auto',
                     }
-        out_tables.append(create_table_view(id, columns, data, style_data_conditional=style_data_conditional, style_table=style_table, style_data=style_data, merge_duplicate_headers=True,))
-    return out_tables
\ No newline at end of file
+        out_tables.append(create_table_view(f'{id}-{ii+1}', columns, data, style_data_conditional=style_data_conditional, style_table=style_table, style_data=style_data, merge_duplicate_headers=True,))
+    return out_tables
@@ -0,0 +1,11 @@
+'''
+WSGI entry point for running the Dash app behind a pre-forking server, e.g.:
+
+    gunicorn -c python/dash_app/gunicorn.conf.py --pythonpath python/dash_app wsgi:server
+
+from the repository root.
+'''
+from app import create_app
+
+app = create_app()
+server = app.server
@@ -12,12 +12,377 @@ Created on 08 Mar 2025
 import numpy as np
 import pandas as pd
 import simpy
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import random
 from tqdm import tqdm
 import json
 import os
+import tempfile
+import time
+
+class ChunkedSeries:
+    """
+    Hourly series stored in a binary file on disk. Values of the hours around the current simulated time
+    are kept in an in-memory chunk, which is written to the file once the simulation moves past it,
+    so memory use does not grow with the simulation duration. The file can be opened as a 
+    read-only numpy.memmap by other processes (see EDSimulation.load_series).
+    =================
+    """
+    def __init__(self, filepath, length, dtype=np.int32, chunk_size=168):
+        """
+        Create the series file, filled with zeros.
+        ===========
+        ARGUMENTS:
+        ===========
+        - filepath: str
+            Path of the binary file backing the series.
+        - length: int
+            Number of hours in the series.
+        ============
+        OPTIONAL:
+        ============
+        - dtype: numpy.dtype
+            Data type of the values. Default is numpy.int32.
+        - chunk_size: int
+            Number of hours kept in memory. Default is 168 (one week).
+        ============
+        """
+        self.filepath = filepath
+        self.length = length
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = min(chunk_size, length)
+        with open(filepath, 'wb') as f:
+            f.truncate(length*self.dtype.itemsize)
+        self._file = open(filepath, 'r+b')
+        self._chunk = np.zeros(self.chunk_size, dtype=self.dtype)
+        self._start = 0
+        
+    def _move_to(self, index):
+        """
+        Flush the current chunk and load the one containing index.
+        """
+        self.flush()
+        self._start = min(index - index % self.chunk_size, self.length - self.chunk_size)
+        self._file.seek(self._start*self.dtype.itemsize)
+        self._file.readinto(memoryview(self._chunk).cast('B'))
+        
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return np.asarray(self)[index]
+        index = int(index)
+        if not self._start <= index < self._start + self.chunk_size:
+            self._move_to(index)
+        return self._chunk[index - self._start]
+    
+    def __setitem__(self, index, value):
+        index = int(index)
+        if not self._start <= index < self._start + self.chunk_size:
+            self._move_to(index)
+        self._chunk[index - self._start] = value
+        
+    def __len__(self):
+        return self.length
+    
+    def __iter__(self):
+        return iter(np.asarray(self))
+    
+    def __array__(self, dtype=None, copy=None):
+        self.flush()
+        values = np.memmap(self.filepath, dtype=self.dtype, mode='r', shape=(self.length,))
+        return values if dtype is None else values.astype(dtype)
+        
+    def flush(self):
+        """
+        Write the in-memory chunk to the file. Nothing is left to write once the file is closed.
+        """
+        if self._file.closed:
+            return
+        self._file.seek(self._start*self.dtype.itemsize)
+        self._file.write(self._chunk.tobytes())
+        self._file.flush()
+        
+    def close(self):
+        """
+        Flush and close the file. The series can still be read afterwards.
+        """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+class EventTrace:
+    """
+    Compact trace of patient events (arrive, assign, depart, renege), stored as fixed-size records in a 
+    ring buffer, or appended to a binary file when a filepath is given. Patients are sampled by ID, so all
+    the events of a traced patient are kept and the cost of tracing scales with the sample rate.
+    =================
+    """
+    EVENTS = ("arrive", "assign", "depart", "renege")
+    ARRIVE, ASSIGN, DEPART, RENEGE = range(4)
+    dtype = np.dtype([("time", "<f8"), ("patient_id", "<i4"), ("acuity", "u1"), ("event", "u1"), ("bed", "<i2")])
+    def __init__(self, capacity=65536, sample_rate=1., filepath=None):
+        """
+        Create an empty trace.
+        ============
+        OPTIONAL:
+        ============
+        - capacity: int
+            Number of records kept in memory. Without filepath, older records are overwritten
+            once the buffer is full. Default is 65536.
+        - sample_rate: float
+            Fraction of patients traced, between 0 and 1. Default is 1.
+        - filepath: str
+            Binary file the records are appended to whenever the buffer is full. Default is None.
+        ============
+        """
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self.filepath = filepath
+        # patients are kept if a multiplicative hash of their ID falls below this threshold
+        self._threshold = int(sample_rate*2**32)
+        self.buffer = np.zeros(capacity, dtype=self.dtype)
+        # number of records made, and number of them written to the file
+        self.position = 0
+        self._written = 0
+        if filepath is not None:
+            open(filepath, 'wb').close()
+            
+    def sampled(self, patient_id):
+        """
+        Whether the events of a patient are traced.
+        """
+        return (patient_id*2654435761) & 0xFFFFFFFF < self._threshold
+    
+    def record(self, time, patient_id, acuity, event, bed=-1):
+        """
+        Record an event.
+        ===========
+        ARGUMENTS:
+        ===========
+        - time: float
+            Simulation time of the event.
+        - patient_id: int
+            ID of the patient.
+        - acuity: int
+            Index of the patient's acuity level in the simulation's acuities.
+        - event: int
+            Event code, index in EVENTS.
+        ============
+        OPTIONAL:
+        ============
+        - bed: int
+            Bed used by the patient, -1 if not assigned. Default is -1.
+        ============
+        """
+        index = self.position % self.capacity
+        self.buffer[index] = (time, patient_id, acuity, event, bed)
+        self.position += 1
+        if self.filepath is not None and index == self.capacity-1:
+            self.flush()
+    
+    def flush(self):
+        """
+        Append the records not yet written to the file.
+        """
+        if self.filepath is None or self.position == self._written:
+            return
+        start = self._written % self.capacity
+        stop = (self.position-1) % self.capacity + 1
+        with open(self.filepath, 'ab') as f:
+            self.buffer[start:stop].tofile(f)
+        self._written = self.position
+            
+    def events(self):
+        """
+        Recorded events in chronological order. With a filepath, the whole file is read.
+        ============
+        RETURNS:
+        ============
+        - events: numpy.ndarray
+            Structured array with fields time, patient_id, acuity, event and bed.
+        ============
+        """
+        if self.filepath is not None:
+            self.flush()
+            return self.read(self.filepath)
+        if self.position <= self.capacity:
+            return self.buffer[:self.position].copy()
+        index = self.position % self.capacity
+        return np.concatenate([self.buffer[index:], self.buffer[:index]])
+    
+    @classmethod
+    def read(cls, filepath):
+        """
+        Read the events written to a trace file, without copying them into memory.
+        ===========
+        ARGUMENTS:
+        ===========
+        - filepath: str
+            Trace file.
+        ============
+        RETURNS:
+        ============
+        - events: numpy.memmap
+            Structured array with fields time, patient_id, acuity, event and bed.
+        ============
+        """
+        if os.path.getsize(filepath) == 0:
+            return np.zeros(0, dtype=cls.dtype)
+        return np.memmap(filepath, dtype=cls.dtype, mode='r')
+
+class PatientRecords:
+    """
+    Append-only table of the patient data (ID, acuity, arrival time and wait time), with one array per column.
+    Records are collected in an in-memory chunk. When a directory is given, full chunks are appended to one
+    binary file per column, so memory use does not grow with the number of patients, and the columns can be
+    opened as read-only numpy.memmap by other processes (see EDSimulation.load_patient_data). Otherwise the
+    arrays grow in memory, at 21 bytes per patient (with float times).
+    =================
+    """
+    def __init__(self, acuities, directory=None, time_dtype=np.float64, chunk_size=8192):
+        """
+        Create an empty table.
+        ===========
+        ARGUMENTS:
+        ===========
+        - acuities: list
+            Acuity levels, the acuity of each patient is stored as its index in this list.
+        ============
+        OPTIONAL:
+        ============
+        - directory: str
+            Directory of the column files, {column}.bin. Default is None (records kept in memory).
+        - time_dtype: numpy.dtype
+            Data type of the arrival and wait times. Default is numpy.float64.
+        - chunk_size: int
+            Number of records kept in memory when directory is set, and initial capacity otherwise. Default is 8192.
+        ============
+        """
+        self.acuities = list(acuities)
+        self.directory = directory
+        self.dtypes = {"Id":np.dtype(np.int32),
+                       "Acuity":np.dtype(np.int8),
+                       "Arrival_Time":np.dtype(time_dtype),
+                       "Wait_Time":np.dtype(time_dtype)}
+        self._columns = {name: np.zeros(chunk_size, dtype=dtype) for name, dtype in self.dtypes.items()}
+        # number of records, index of the first record of the chunk and number of records of the chunk in the files
+        self._size = 0
+        self._offset = 0
+        self._written = 0
+        if directory is not None:
+            for name in self.dtypes:
+                open(self.filepath(name), 'wb').close()
+
+    def filepath(self, name):
+        """
+        Path of the file of a column, when directory is set.
+        """
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def append(self, patient_id, acuity, arrival_time, wait_time):
+        """
+        Add the record of a patient.
+        ===========
+        ARGUMENTS:
+        ===========
+        - patient_id: int
+            ID of the patient.
+        - acuity: int
+            Index of the patient's acuity level in acuities.
+        - arrival_time: int or float
+            Arrival time of the patient.
+        - wait_time: int or float
+            Wait time of the patient.
+        ============
+        """
+        index = self._size - self._offset
+        capacity = len(self._columns["Id"])
+        if index == capacity:
+            if self.directory is None:
+                self._columns = {name: np.concatenate([values, np.zeros_like(values)]) for name, values in self._columns.items()}
+            else:
+                self.flush()
+                self._offset = self._size
+                self._written = 0
+                index = 0
+        columns = self._columns
+        columns["Id"][index] = patient_id
+        columns["Acuity"][index] = acuity
+        columns["Arrival_Time"][index] = arrival_time
+        columns["Wait_Time"][index] = wait_time
+        self._size += 1
+
+    def __len__(self):
+        return self._size
+
+    def flush(self):
+        """
+        Append the records not yet written to the column files, if directory is set.
+        """
+        stop = self._size - self._offset
+        if self.directory is None or stop == self._written:
+            return
+        for name, values in self._columns.items():
+            with open(self.filepath(name), 'ab') as f:
+                values[self._written:stop].tofile(f)
+        self._written = stop
+
+    def column(self, name, start=0):
+        """
+        Values of a column, from the record start. With a directory, the column file is read
+        without copying it into memory.
+        ===========
+        ARGUMENTS:
+        ===========
+        - name: str
+            Column, "Id", "Acuity", "Arrival_Time" or "Wait_Time".
+        ============
+        OPTIONAL:
+        ============
+        - start: int
+            Index of the first record. Default is 0.
+        ============
+        RETURNS:
+        ============
+        - values: numpy.ndarray
+            Values of the column, acuities as indices in acuities.
+        ============
+        """
+        if self.directory is None:
+            return self._columns[name][start:self._size]
+        self.flush()
+        if self._size == 0:
+            return np.zeros(0, dtype=self.dtypes[name])
+        return np.memmap(self.filepath(name), dtype=self.dtypes[name], mode='r', shape=(self._size,))[start:]
+
+    def to_dataframe(self, start=0):
+        """
+        Patient data as a DataFrame, with the acuity as a categorical column. The columns are not copied.
+        ============
+        OPTIONAL:
+        ============
+        - start: int
+            Index of the first record. Default is 0.
+        ============
+        RETURNS:
+        ============
+        - patient_data: pandas.DataFrame
+            Patient data with ID, acuity, arrival time and wait time.
+        ============
+        """
+        return self.dataframe({name: self.column(name, start) for name in self.dtypes}, self.acuities)
+
+    @staticmethod
+    def dataframe(columns, acuities):
+        """
+        DataFrame of patient data columns, without copying them.
+        """
+        acuity = pd.Categorical.from_codes(columns["Acuity"], categories=acuities, validate=False)
+        return pd.DataFrame({**columns, "Acuity": acuity}, copy=False)
+
+    def __iter__(self):
+        # records as dicts, like the rows of the patient data
+        for patient_id, acuity, arrival_time, wait_time in zip(*(self.column(name).tolist() for name in self.dtypes)):
+            yield {"Id":patient_id, "Acuity":self.acuities[acuity], "Arrival_Time":arrival_time, "Wait_Time":wait_time}
 
 class EDSimulation:
     """
@@ -27,6 +392,21 @@ class EDSimulation:
     acuities = ["Major", "Minor", "Resus"]
     start_datetime = datetime(2024,1,1,0,0)
     RANDOM_SEED = 42
+    storage_dir = None
+    storage_chunk = 168
+    show_progress = True
+    trace = None
+    publisher = None
+    publish_interval = 1.
+    # None draws random variates natively; False/True draw them by inversion of U/(1-U) (antithetic variates)
+    antithetic = None
+    # continuous-time arrivals, width of the bins of the series (hours) and length of stay distribution
+    continuous = False
+    resolution = 1.
+    los_distribution = None
+    los_cv = None
+    # series tracked for each acuity level, one value per bin of resolution hours
+    series_names = ["patient_count", "bed_usage", "queue_lengths", "total_occupancy"]
     def __init__(self, LENGTH_OF_STAY, ARRIVALS_BEFORE_9, ARRIVALS_AFTER_9, SIMULATION_DURATION, MIN_PATIENCE_MINOR, MAX_PATIENCE_MINOR, **kwargs):
         """
         Initialize the simulation.
@@ -54,6 +434,34 @@ class EDSimulation:
             Start datetime of the simulation. Default is datetime(2024,1,1,0,0).
         - RANDOM_SEED: int
             Random seed for the simulation. Default is 42.
+        - storage_dir: str
+            Directory where each run writes its hourly series (int32) and patient data, chunk by chunk during 
+            the simulation, as memory-mapped files in a subdirectory of its own (run_dir). Default is None 
+            (float64 series and patient data in memory).
+        - storage_chunk: int
+            Number of hours of each series kept in memory when storage_dir is set. Default is 168.
+        - show_progress: bool
+            Show a progress bar while the simulation runs. Default is True.
+        - trace: EventTrace
+            Trace where patient events are recorded. Default is None (no tracing).
+        - publisher: callable
+            Called with the new hourly results while the simulation runs (see publish_partial_results).
+            If it returns True, the simulation is aborted. Default is None.
+        - publish_interval: float
+            Minimum number of seconds between two calls to the publisher. Default is 1.
+        - continuous: bool
+            Run in continuous time: patients arrive one by one within each hour (exponential interarrival 
+            times) instead of all at the start of the hour, and times are not truncated to hours. 
+            Default is False.
+        - resolution: float
+            Width in hours of the bins of the series, e.g. 0.25 for 15 minutes. SIMULATION_DURATION must 
+            be a multiple of it. Default is 1.
+        - los_distribution: str
+            Distribution of the lengths of stay, "poisson", "lognormal" or "gamma", with mean LENGTH_OF_STAY. 
+            Default is None ("lognormal" in continuous time, "poisson" otherwise).
+        - los_cv: float
+            Coefficient of variation of the lognormal and gamma lengths of stay. Default is None 
+            (1/sqrt(LENGTH_OF_STAY), the same variance as the Poisson distribution).
         ============   
         """
         self.__dict__.update(**kwargs)
@@ -64,20 +472,179 @@ class EDSimulation:
         self.MIN_PATIENCE_MINOR = MIN_PATIENCE_MINOR
         self.MAX_PATIENCE_MINOR = MAX_PATIENCE_MINOR
         # set a seeded random generator, for consistency
-        self.rng = np.random.default_rng(self.RANDOM_SEED)
+        self.set_seed(self.RANDOM_SEED)
+        
+    def set_seed(self, seed, separate_streams=False):
+        """
+        Seed the random generators of the simulation.
+        ===========
+        ARGUMENTS:
+        ===========
+        - seed: int or numpy.random.SeedSequence
+            Seed of the random generators.
+        ============
+        OPTIONAL:
+        ============
+        - separate_streams: bool
+            Use an independent stream for arrivals, lengths of stay and patience, so that
+            runs with different NUM_BEDS consume the same random numbers for the same purpose
+            (common random numbers). Default is False (a single generator, self.rng).
+        ============
+        """
+        if separate_streams:
+            seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+            # spawn() changes the sequence it is called on, spawn from a copy so that the same seed 
+            # always gives the same streams (common random numbers across configurations)
+            seed = np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key, pool_size=seed.pool_size)
+            self.arrival_rng, self.stay_rng, self.patience_rng = [np.random.default_rng(s) for s in seed.spawn(3)]
+            self.rng = self.arrival_rng
+        else:
+            self.rng = np.random.default_rng(seed)
+            self.arrival_rng = self.stay_rng = self.patience_rng = self.rng
+        
+    def draw_poisson(self, lam, rng):
+        """
+        Draw a Poisson variate, by inversion of the CDF when antithetic is not None.
+        ===========
+        ARGUMENTS:
+        ===========
+        - lam: float
+            Mean of the Poisson distribution.
+        - rng: numpy.random.Generator
+            Random generator to draw from.
+        ============
+        RETURNS:
+        ============
+        - value: numpy.ndarray
+            Array of size 1 with the drawn value.
+        ============
+        """
+        if self.antithetic is None:
+            return rng.poisson(lam, size=1)
+        u = rng.random()
+        if self.antithetic:
+            u = 1. - u
+        cdf = self._poisson_cdf(lam)
+        return np.array([min(np.searchsorted(cdf, u), len(cdf)-1)])
+    
+    def draw_stay(self, acuity, size):
+        """
+        Draw lengths of stay of an acuity level from los_distribution, by inversion of the CDF 
+        when antithetic is not None.
+        ===========
+        ARGUMENTS:
+        ===========
+        - acuity: str
+            Acuity level of the patients.
+        - size: int
+            Number of lengths of stay to draw.
+        ============
+        RETURNS:
+        ============
+        - values: numpy.ndarray
+            Lengths of stay in hours.
+        ============
+        """
+        mean = self.LENGTH_OF_STAY[acuity]
+        distribution = self.los_distribution or ("lognormal" if self.continuous else "poisson")
+        rng = self.stay_rng
+        if distribution == "poisson":
+            if self.antithetic is None:
+                return rng.poisson(mean, size=size).astype(np.float64)
+            cdf = self._poisson_cdf(mean)
+            return np.minimum(np.searchsorted(cdf, self._draw_quantiles(rng, size)), len(cdf)-1).astype(np.float64)
+        if distribution not in ("lognormal", "gamma"):
+            raise ValueError(f"Unknown los_distribution: {distribution}.")
+        cv = self.los_cv if self.los_cv is not None else (1/np.sqrt(mean) if mean > 0 else 0.)
+        if mean <= 0 or cv <= 0:
+            return np.full(size, float(mean))
+        if distribution == "lognormal":
+            sigma = np.sqrt(np.log1p(cv**2))
+            mu = np.log(mean) - sigma**2/2
+            if self.antithetic is None:
+                return rng.lognormal(mu, sigma, size=size)
+            from scipy.special import ndtri
+            return np.exp(mu + sigma*ndtri(self._draw_quantiles(rng, size)))
+        shape, scale = 1/cv**2, mean*cv**2
+        if self.antithetic is None:
+            return rng.gamma(shape, scale, size=size)
+        from scipy.special import gammaincinv
+        return scale*gammaincinv(shape, self._draw_quantiles(rng, size))
+    
+    def _draw_quantiles(self, rng, size):
+        # uniform draws for inversion, 1-U instead of U when antithetic is True
+        u = rng.random(size)
+        return 1. - u if self.antithetic else u
+    
+    def _poisson_cdf(self, lam):
+        # CDF tables are cached per mean, as only a few distinct means are used
+        cache = self.__dict__.setdefault("_poisson_cdf_cache", {})
+        if lam not in cache:
+            from scipy.stats import poisson
+            cache[lam] = poisson.cdf(np.arange(int(lam + 12*np.sqrt(lam) + 20)), lam)
+        return cache[lam]
+    
+    def draw_uniform(self, low, high, rng):
+        """
+        Draw a uniform variate in [low, high), using 1-U instead of U when antithetic is True.
+        ===========
+        ARGUMENTS:
+        ===========
+        - low: float
+            Lower bound.
+        - high: float
+            Upper bound.
+        - rng: numpy.random.Generator
+            Random generator to draw from.
+        ============
+        RETURNS:
+        ============
+        - value: numpy.ndarray
+            Array of size 1 with the drawn value.
+        ============
+        """
+        if self.antithetic is None:
+            return rng.uniform(low, high, size=1)
+        u = rng.random()
+        if self.antithetic:
+            u = 1. - u
+        return np.array([low + (high-low)*u])
         
     def reset_variables(self):
         """
         Reset the variables for the simulation.
         """
+        # Number of bins of resolution hours in the series
+        self.bins_per_hour = 1./self.resolution
+        n_bins = self.SIMULATION_DURATION*self.bins_per_hour
+        if self.resolution <= 0 or abs(n_bins - round(n_bins)) > 1e-9:
+            raise ValueError("SIMULATION_DURATION must be a multiple of resolution.")
+        self.n_bins = int(round(n_bins))
         # Initialise data structures for tracking patient counts, occupancy, and queue lengths
-        self.patient_count = {acuity: np.zeros(self.SIMULATION_DURATION) for acuity in self.acuities}
-        self.bed_usage = {acuity: np.zeros(self.SIMULATION_DURATION) for acuity in self.acuities}
-        self.queue_lengths = {acuity: np.zeros(self.SIMULATION_DURATION) for acuity in self.acuities}
-        self.total_occupancy = {acuity: np.zeros(self.SIMULATION_DURATION) for acuity in self.acuities}
-        # Initialise preset storage for patient data (arrival, stay and wait time) and patient ID
-        self.patient_data = []
+        if self.storage_dir is None:
+            for name in self.series_names:
+                setattr(self, name, {acuity: np.zeros(self.n_bins) for acuity in self.acuities})
+        else:
+            self.close_series()
+            os.makedirs(self.storage_dir, exist_ok=True)
+            # every run gets its own directory, so that runs of other processes (replications, sweeps)
+            # never overwrite files which may still be memory-mapped
+            self.run_dir = tempfile.mkdtemp(prefix=datetime.now().strftime("run_%Y%m%d_%H%M%S_"), dir=self.storage_dir)
+            for name in self.series_names:
+                setattr(self, name, {acuity: ChunkedSeries(os.path.join(self.run_dir, f"{name}_{acuity}.bin"), 
+                                                           self.n_bins, np.int32, self.storage_chunk) 
+                                     for acuity in self.acuities})
+        # Initialise preset storage for patient data (arrival and wait time) and patient ID,
+        # times are whole hours unless the simulation runs in continuous time
+        self.patient_data = PatientRecords(self.acuities, 
+                                           None if self.storage_dir is None else self.run_dir, 
+                                           np.float64 if self.continuous else np.int32)
+        self._acuity_index = {acuity: ii for ii, acuity in enumerate(self.acuities)}
         self.patient_id = 0
+        # number of patients who left without being assigned a bed
+        self.reneged = {acuity: 0 for acuity in self.acuities}
+        # free bed numbers of each acuity level, only tracked for the event trace
+        self.free_beds = {}
         # reset total beds
         self.total_beds = 0
         
@@ -111,9 +678,163 @@ class EDSimulation:
         
         env.process(self.patient_arrival(env,resources))
         env.process(self.collect_data(env, resources))
-        [env.run(until=i) for i in tqdm(range(1,self.SIMULATION_DURATION), desc="Running Simulation")]
+        self.run_environment(env)
         
-        return pd.DataFrame(self.patient_data)
+        return self.patient_data.to_dataframe()
+    
+    def run_environment(self, env):
+        """
+        Run the simulation environment hour by hour until SIMULATION_DURATION. If a publisher is set,
+        the results of the bins simulated so far are published at most every publish_interval seconds,
+        and the run stops early (with self.aborted set) if the publisher asks for it.
+        ===========
+        ARGUMENTS:
+        ===========
+        - env: simpy.Environment
+            Simulation environment, with the patient arrival and data collection processes.
+        ============
+        """
+        self.aborted = False
+        self.published_hours = 0
+        self._published_patients = 0
+        last_publish = time.monotonic()
+        for hour in tqdm(range(1,self.SIMULATION_DURATION), desc="Running Simulation", disable=not self.show_progress):
+            env.run(until=hour)
+            if self.publisher is not None and time.monotonic() - last_publish >= self.publish_interval:
+                last_publish = time.monotonic()
+                if self.publish_partial_results(int(hour*self.bins_per_hour)):
+                    self.aborted = True
+                    break
+        if self.publisher is not None and not self.aborted:
+            self.publish_partial_results(int((self.SIMULATION_DURATION-1)*self.bins_per_hour))
+        self.flush_series()
+        # write the last partial buffer of the trace, so other processes can read the whole run
+        if self.trace is not None:
+            self.trace.flush()
+        
+    def publish_partial_results(self, stop):
+        """
+        Send the results of the bins not yet published, up to (excluding) stop, to the publisher.
+        The publisher receives a dict with 'start' and 'stop' bins, the 'resolution' of the bins in hours and, 
+        for each acuity level, the 'Bed Usage' and 'Queue Lengths' of those bins and the average 'Wait Time' 
+        of the patients whose wait ended in each bin (None if none did).
+        ===========
+        ARGUMENTS:
+        ===========
+        - stop: int
+            Bin up to which the results are complete.
+        ============
+        RETURNS:
+        ============
+        - abort: bool
+            Value returned by the publisher, True to abort the simulation.
+        ============
+        """
+        start = self.published_hours
+        n_bins = stop - start
+        # patients whose wait ended since the last update
+        acuity = self.patient_data.column("Acuity", self._published_patients)
+        wait = self.patient_data.column("Wait_Time", self._published_patients).astype(np.float64)
+        index = ((self.patient_data.column("Arrival_Time", self._published_patients) + wait)*self.bins_per_hour).astype(np.int64) - start
+        in_range = (index >= 0) & (index < n_bins)
+        wait_sums, wait_counts = {}, {}
+        for ii, acuity_name in enumerate(self.acuities):
+            mask = in_range & (acuity == ii)
+            wait_sums[acuity_name] = np.bincount(index[mask], weights=wait[mask], minlength=n_bins)
+            wait_counts[acuity_name] = np.bincount(index[mask], minlength=n_bins)
+        update = {"start": start, 
+                  "stop": stop,
+                  "resolution": self.resolution,
+                  "Bed Usage": {acuity: np.asarray(self.bed_usage[acuity][start:stop]).tolist() for acuity in self.acuities},
+                  "Queue Lengths": {acuity: np.asarray(self.queue_lengths[acuity][start:stop]).tolist() for acuity in self.acuities},
+                  "Wait Time": {acuity: [s/c if c else None for s, c in zip(wait_sums[acuity], wait_counts[acuity])] 
+                                for acuity in self.acuities},
+                  }
+        self.published_hours = stop
+        self._published_patients = len(self.patient_data)
+        return bool(self.publisher(update))
+        
+    def flush_series(self):
+        """
+        Write the series and patient data stored on disk (see storage_dir) and their metadata, 
+        so they can be read by other processes with load_series and load_patient_data.
+        """
+        if self.storage_dir is None:
+            return
+        for name in self.series_names:
+            for series in getattr(self, name).values():
+                series.flush()
+        self.patient_data.flush()
+        metadata = {"SIMULATION_DURATION":self.SIMULATION_DURATION,
+                    "resolution":self.resolution,
+                    "length":self.n_bins,
+                    "start_datetime":self.start_datetime.strftime("%Y-%m-%d %H:%M:%S"),
+                    "dtype":"int32",
+                    "acuities":list(self.acuities),
+                    "series":{name:{acuity:f"{name}_{acuity}.bin" for acuity in self.acuities} 
+                              for name in self.series_names},
+                    "patients":len(self.patient_data),
+                    "patient_data":{name:{"file":f"{name}.bin", "dtype":dtype.name} 
+                                    for name, dtype in self.patient_data.dtypes.items()},
+                    }
+        with open(os.path.join(self.run_dir, "series.json"), 'w') as f:
+            json.dump(metadata, f, ensure_ascii=True, indent=4)
+            
+    def close_series(self):
+        """
+        Close the files of the series stored on disk, if any.
+        """
+        for name in self.series_names:
+            for series in getattr(self, name, {}).values():
+                if isinstance(series, ChunkedSeries):
+                    series.close()
+    
+    @staticmethod
+    def load_series(run_dir):
+        """
+        Open the series written by a simulation run with storage_dir, without copying them into memory.
+        ===========
+        ARGUMENTS:
+        ===========
+        - run_dir: str
+            Directory of the run, run_dir of the simulation (a subdirectory of storage_dir).
+        ============
+        RETURNS:
+        ============
+        - series: dict
+            Read-only numpy.memmap for each series and acuity level, {name: {acuity: memmap}}.
+        ============
+        """
+        with open(os.path.join(run_dir, "series.json")) as f:
+            metadata = json.load(f)
+        return {name: {acuity: np.memmap(os.path.join(run_dir, filename), dtype=metadata["dtype"], mode='r', 
+                                         shape=(metadata.get("length", metadata["SIMULATION_DURATION"]),)) 
+                       for acuity, filename in files.items()} 
+                for name, files in metadata["series"].items()}
+    
+    @staticmethod
+    def load_patient_data(run_dir):
+        """
+        Open the patient data written by a simulation run with storage_dir, without copying it into memory.
+        ===========
+        ARGUMENTS:
+        ===========
+        - run_dir: str
+            Directory of the run, run_dir of the simulation (a subdirectory of storage_dir).
+        ============
+        RETURNS:
+        ============
+        - patient_data: pd.DataFrame
+            Patient data with ID, acuity, arrival time and wait time, backed by read-only numpy.memmap.
+        ============
+        """
+        with open(os.path.join(run_dir, "series.json")) as f:
+            metadata = json.load(f)
+        n_patients = metadata["patients"]
+        columns = {name: (np.memmap(os.path.join(run_dir, column["file"]), dtype=column["dtype"], mode='r', shape=(n_patients,)) 
+                          if n_patients else np.zeros(0, dtype=column["dtype"])) 
+                   for name, column in metadata["patient_data"].items()}
+        return PatientRecords.dataframe(columns, metadata["acuities"])
         
     def patient_arrival(self, env, resources):
         """
@@ -128,21 +849,59 @@ class EDSimulation:
             Resources for each acuity level, where keys are acuities and values are simpy.Resource objects.
         ============
         """
+        if self.continuous:
+            yield from self.continuous_patient_arrival(env, resources)
+            return
         patient_id = 0
         while True:
             current_hour = env.now % 24
             if current_hour <= 9:
-                patients_per_acuities = {acuity: self.rng.poisson(self.ARRIVALS_BEFORE_9[acuity],size=1) for acuity in self.acuities}
+                patients_per_acuities = {acuity: self.draw_poisson(self.ARRIVALS_BEFORE_9[acuity], self.arrival_rng) for acuity in self.acuities}
             else:
-                patients_per_acuities = {acuity: self.rng.poisson(self.ARRIVALS_AFTER_9[acuity],size=1) for acuity in self.acuities}
+                patients_per_acuities = {acuity: self.draw_poisson(self.ARRIVALS_AFTER_9[acuity], self.arrival_rng) for acuity in self.acuities}
                 
             for acuity, num_patients in patients_per_acuities.items():
                 for _ in np.arange(0,num_patients):
-                    stay_duration = self.rng.poisson(self.LENGTH_OF_STAY[acuity], size=1)
+                    if self.los_distribution in (None, "poisson"):
+                        stay_duration = int(self.draw_poisson(self.LENGTH_OF_STAY[acuity], self.stay_rng)[0])
+                    else:
+                        stay_duration = float(self.draw_stay(acuity, 1)[0])
                     patient_id += 1
                     env.process(self.track_patient(env, patient_id, acuity, stay_duration, resources[acuity]))
             yield env.timeout(1)
             
+    def continuous_patient_arrival(self, env, resources):
+        """
+        Generate patients in continuous time. Within each hour, the arrivals of each acuity level are a 
+        Poisson process with the rate of the period (before or after 9am), i.e. exponential interarrival times. 
+        The number of arrivals in the hour is drawn first and their times are then uniform in the hour, 
+        which gives the same process while drawing the arrivals and lengths of stay of a whole hour at once.
+        ===========
+        ARGUMENTS:
+        ===========
+        - env: simpy.Environment
+            Simulation environment.
+        - resources: dict
+            Resources for each acuity level, where keys are acuities and values are simpy.Resource objects.
+        ============
+        """
+        patient_id = 0
+        hour = 0
+        while True:
+            rates = self.ARRIVALS_BEFORE_9 if hour % 24 <= 9 else self.ARRIVALS_AFTER_9
+            counts = [int(self.draw_poisson(rates[acuity], self.arrival_rng)[0]) for acuity in self.acuities]
+            times = hour + self._draw_quantiles(self.arrival_rng, sum(counts))
+            stays = np.concatenate([self.draw_stay(acuity, n) for acuity, n in zip(self.acuities, counts)])
+            acuity_indices = np.repeat(np.arange(len(self.acuities)), counts)
+            order = np.argsort(times, kind="stable")
+            for arrival_time, ii, stay_duration in zip(times[order].tolist(), acuity_indices[order].tolist(), stays[order].tolist()):
+                yield env.timeout(max(arrival_time - env.now, 0.))
+                patient_id += 1
+                acuity = self.acuities[ii]
+                env.process(self.track_patient(env, patient_id, acuity, stay_duration, resources[acuity]))
+            hour += 1
+            yield env.timeout(max(hour - env.now, 0.))
+            
     def track_patient(self, env, patient_id, acuity, stay_duration, resource):
         """
         Tracks the patient's arrival, wait time, length of stay and departure.
@@ -155,41 +914,88 @@ class EDSimulation:
             ID of the patient.
         - acuity: str
             Acuity level of the patient.
-        - stay_duration: int
-            Length of stay of the patient.
+        - stay_duration: int or float
+            Length of stay of the patient in hours.
         - resource: simpy.Resource
             Resource for the patient.
         ============
         """
-        arrival_time = int(env.now)
-        self.patient_count[acuity][arrival_time] += 1
-        self.total_occupancy[acuity][arrival_time] += 1
+        # in continuous time, times are kept exact and only the series are binned
+        continuous = self.continuous
+        bins_per_hour = self.bins_per_hour
+        arrival_time = env.now if continuous else int(env.now)
+        arrival_bin = int(env.now*bins_per_hour)
+        self.patient_count[acuity][arrival_bin] += 1
+        self.total_occupancy[acuity][arrival_bin] += 1
+        # when tracing, beds are numbered for every patient but only sampled patients are recorded
+        trace = self.trace
+        traced = trace is not None and trace.sampled(patient_id)
+        if traced:
+            acuity_index = self.acuities.index(acuity)
+            trace.record(env.now, patient_id, acuity_index, trace.ARRIVE)
         
         if acuity == "Minor":
-            reneging_time = self.rng.uniform(self.MIN_PATIENCE_MINOR, self.MAX_PATIENCE_MINOR, size=1)
+            reneging_time = float(self.draw_uniform(self.MIN_PATIENCE_MINOR, self.MAX_PATIENCE_MINOR, self.patience_rng)[0])
             with resource.request() as req:
                 result = yield req | env.timeout(reneging_time)
                 if req in result:
-                    bed_assigned_time = int(env.now)
+                    bed_assigned_time = env.now if continuous else int(env.now)
                     wait_time = bed_assigned_time - arrival_time
                     self.update_patient_data(patient_id, acuity, arrival_time, wait_time)
+                    if trace is not None:
+                        bed = self.assign_bed(acuity, resource.capacity)
+                        if traced:
+                            trace.record(env.now, patient_id, acuity_index, trace.ASSIGN, bed)
                     yield env.timeout(stay_duration)
-                    end_time = int(env.now)
-                    self.patient_count[acuity][end_time] -= 1
+                    self.patient_count[acuity][int(env.now*bins_per_hour)] -= 1
+                    if trace is not None:
+                        self.free_beds[acuity].append(bed)
+                        if traced:
+                            trace.record(env.now, patient_id, acuity_index, trace.DEPART, bed)
                 else:
-                    renege_time = int(env.now)
+                    renege_time = env.now if continuous else int(env.now)
                     wait_time = renege_time - arrival_time
                     self.update_patient_data(patient_id, acuity, arrival_time, wait_time)
-                    self.patient_count[acuity][renege_time] -= 1
+                    self.patient_count[acuity][int(env.now*bins_per_hour)] -= 1
+                    self.reneged[acuity] += 1
+                    if traced:
+                        trace.record(env.now, patient_id, acuity_index, trace.RENEGE)
         else:
             with resource.request() as req:
                 yield req
-                bed_assigned_time = int(env.now)
+                bed_assigned_time = env.now if continuous else int(env.now)
                 wait_time = bed_assigned_time - arrival_time
                 self.update_patient_data(patient_id, acuity, arrival_time, wait_time)
+                if trace is not None:
+                    bed = self.assign_bed(acuity, resource.capacity)
+                    if traced:
+                        trace.record(env.now, patient_id, acuity_index, trace.ASSIGN, bed)
                 yield env.timeout(stay_duration)
-                end_time = int(env.now)
-                self.patient_count[acuity][end_time] -= 1
+                self.patient_count[acuity][int(env.now*bins_per_hour)] -= 1
+                if trace is not None:
+                    self.free_beds[acuity].append(bed)
+                    if traced:
+                        trace.record(env.now, patient_id, acuity_index, trace.DEPART, bed)
+                        
+    def assign_bed(self, acuity, capacity):
+        """
+        Take a free bed of an acuity level, the most recently freed one first.
+        ===========
+        ARGUMENTS:
+        ===========
+        - acuity: str
+            Acuity level of the patient.
+        - capacity: int
+            Number of beds of the acuity level.
+        ============
+        RETURNS:
+        ============
+        - bed: int
+            Number of the assigned bed.
+        ============
+        """
+        free_beds = self.free_beds.setdefault(acuity, list(range(capacity-1, -1, -1)))
+        return free_beds.pop()
         
     def update_patient_data(self, patient_id, acuity, arrival_time, wait_time):
         """
@@ -201,22 +1007,18 @@ class EDSimulation:
             Acuity level of the patient.
         - patient_id: int
             ID of the patient.
-        - arrival_time: int
+        - arrival_time: int or float
             Arrival time of the patient.
-        - wait_time: int
+        - wait_time: int or float
             Wait time of the patient.
         ============
         """
         # print(f"Saving data of patient {patient_id}.", end="\r", flush=True)
-        self.patient_data.append({"Id":patient_id, 
-                                  "Acuity":acuity, 
-                                  "Arrival_Time":arrival_time, 
-                                  "Wait_Time":wait_time
-                                  })
+        self.patient_data.append(patient_id, self._acuity_index[acuity], arrival_time, wait_time)
         
     def collect_data(self, env, resources):
         """
-        Collect data for tracking patient counts, occupancy, and queue lengths.
+        Collect data for tracking patient counts, occupancy, and queue lengths, at the start of each bin.
         ===========
         ARGUMENTS:
         ===========
@@ -226,31 +1028,43 @@ class EDSimulation:
             Resources for each acuity level.
         ============
         """
+        step = 0
         while True:
             for acuity in self.acuities:
-                self.bed_usage[acuity][int(env.now)] = resources[acuity].count
-                self.queue_lengths[acuity][int(env.now)] = len(resources[acuity].queue)
-            yield env.timeout(1)
+                self.bed_usage[acuity][step] = resources[acuity].count
+                self.queue_lengths[acuity][step] = len(resources[acuity].queue)
+            step += 1
+            # bin edges are computed from the step, so that they do not drift with fractional resolutions
+            yield env.timeout(step*self.resolution - env.now)
     
     @staticmethod 
-    def calculate_average_wait_time(patient_data):
+    def calculate_average_wait_time(patient_data, resolution=1.):
         """
-        Calculate the average wait time for each acuity level.
+        Calculate the average wait time of the patients arriving in each bin, for each acuity level.
+        Bins without arrivals of an acuity level count as 0, up to the last bin with any arrival, 
+        so that row i of the result is bin i.
         ===========
         ARGUMENTS:
         ===========
         - patient_data: pandas.DataFrame
             Patient data with ID, acuity, arrival time and wait time.
         ============
+        OPTIONAL:
+        ============
+        - resolution: float
+            Width of the bins in hours. Default is 1.
+        ============
         RETURNS:
         ============
         - average_wait_time: dict
             Average wait time for each acuity level.
         ============
         """
-        df = pd.DataFrame(patient_data)
-        df["Hour"] = df["Arrival_Time"]
-        average_wait_time = df.groupby(["Hour","Acuity"])["Wait_Time"].mean().unstack().fillna(0)
+        df = patient_data.to_dataframe() if isinstance(patient_data, PatientRecords) else pd.DataFrame(patient_data)
+        df["Bin"] = (df["Arrival_Time"]*(1./resolution)).astype(int)
+        average_wait_time = df.groupby(["Bin","Acuity"], observed=True)["Wait_Time"].mean().unstack()
+        # bins in which nobody arrived are missing from the groupby, keep them so the bins stay aligned with time
+        average_wait_time = average_wait_time.reindex(range(df["Bin"].max()+1)).fillna(0)
         return average_wait_time
 
     @staticmethod
@@ -278,6 +1092,80 @@ class EDSimulation:
         percentiles = {acuity: average_wait_time[acuity].quantile(quantiles).to_dict() for acuity in acuities}
         return percentiles
     
+    def calculate_hourly_wait_time(self):
+        """
+        Calculate the average wait time of the patients arriving in each bin (hour by default, see resolution), 
+        for each acuity level, directly from the patient data with NumPy. Bins without arrivals of an acuity 
+        level count as 0, up to the last bin with any arrival, as in calculate_average_wait_time.
+        ============
+        RETURNS:
+        ============
+        - hourly_wait_time: dict
+            Array of average wait time per bin for each acuity level.
+        ============
+        """
+        n_patients = len(self.patient_data)
+        acuity = self.patient_data.column("Acuity")
+        arrival = (self.patient_data.column("Arrival_Time")*self.bins_per_hour).astype(np.int64)
+        wait = self.patient_data.column("Wait_Time").astype(np.float64)
+        n_hours = int(arrival.max())+1 if n_patients else 0
+        hourly_wait_time = {}
+        for ii, acuity_name in enumerate(self.acuities):
+            mask = acuity == ii
+            counts = np.bincount(arrival[mask], minlength=n_hours)
+            sums = np.bincount(arrival[mask], weights=wait[mask], minlength=n_hours)
+            hourly_wait_time[acuity_name] = np.divide(sums, counts, out=np.zeros(n_hours), where=counts>0)
+        return hourly_wait_time
+
+    @staticmethod
+    def describe(values):
+        """
+        Descriptive statistics of an array, with the same fields as pandas.DataFrame.describe.
+        ===========
+        ARGUMENTS:
+        ===========
+        - values: array-like
+            Values to describe.
+        ============
+        RETURNS:
+        ============
+        - stats: dict
+            count, mean, std, min, 25%, 50%, 75% and max of the values.
+        ============
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return {key: (0. if key == "count" else None) for key in ["count","mean","std","min","25%","50%","75%","max"]}
+        q25, q50, q75 = np.percentile(values, [25,50,75])
+        return {"count": float(values.size),
+                "mean": float(values.mean()),
+                "std": float(values.std(ddof=1)) if values.size > 1 else None,
+                "min": float(values.min()),
+                "25%": float(q25),
+                "50%": float(q50),
+                "75%": float(q75),
+                "max": float(values.max()),
+                }
+
+    def summary_statistics(self):
+        """
+        Compute summary statistics of the series of the last simulation run.
+        ============
+        RETURNS:
+        ============
+        - summary: dict
+            Statistics (see describe) for each property and acuity level, {property: {acuity: stats}}.
+            Properties are 'Bed Usage', 'Queue Lengths', 'Total Occupancy' and 'Average Wait Time'.
+        ============
+        """
+        hourly_data = {'Bed Usage':self.bed_usage, 
+                       'Queue Lengths':self.queue_lengths, 
+                       'Total Occupancy':self.total_occupancy, 
+                       'Average Wait Time':self.calculate_hourly_wait_time()}
+        summary = {key: {acuity: self.describe(dset[acuity]) for acuity in self.acuities} 
+                   for key, dset in hourly_data.items()}
+        return summary
+
     def plot_results(self, acuity_colors=['firebrick','olivedrab','navy'], row_size=3, aspect_ratio=1.5):
         """
         Plot the results of the simulation.
@@ -292,10 +1180,13 @@ class EDSimulation:
             Aspect ratio of the plot. Default is 1.5
         ============
         """
-        x = [(self.start_datetime+timedelta(hours=i)) for i in range(self.SIMULATION_DURATION)]
-        x_ticks = [x[i]  for i in range(0,len(x),24)]
-        x_labels = [x[i].strftime("%Y-%m-%d")  for i in range(0,len(x),24)]
-        average_wait_time = self.calculate_average_wait_time(self.patient_data)
+        # matplotlib is only needed for plotting, keep it out of the app's workers
+        import matplotlib.pyplot as plt
+        x = [(self.start_datetime+timedelta(hours=i*self.resolution)) for i in range(self.n_bins)]
+        day = max(int(round(24*self.bins_per_hour)), 1)
+        x_ticks = [x[i]  for i in range(0,len(x),day)]
+        x_labels = [x[i].strftime("%Y-%m-%d")  for i in range(0,len(x),day)]
+        average_wait_time = self.calculate_average_wait_time(self.patient_data, self.resolution)
         
         # set legend keyword arguments
         legend_kws = dict(loc='lower left', 
@@ -382,12 +1273,212 @@ class EDSimulation:
                     "SIMULATION_DURATION":self.SIMULATION_DURATION,
                     "MIN_PATIENCE_MINOR":self.MIN_PATIENCE_MINOR,
                     "MAX_PATIENCE_MINOR":self.MAX_PATIENCE_MINOR,
+                    "continuous":self.continuous,
+                    "resolution":self.resolution,
+                    "los_distribution":self.los_distribution or ("lognormal" if self.continuous else "poisson"),
+                    "los_cv":self.los_cv,
                     "NUM_BEDS":self.NUM_BEDS,
                     "total_beds":self.total_beds,
+                    "summary":self.summary_statistics(),
                     }
         with open(metafile, 'w') as f:
             json.dump(metadata, f, ensure_ascii=True, indent=4)
         # Save patient data to csv file
-        df = pd.DataFrame(self.patient_data)
+        df = self.patient_data.to_dataframe()
         df.to_csv(filepath, index=False, sep="\t")
-        print(f"Patient data saved to:\n{filepath}")
\ No newline at end of file
+        print(f"Patient data saved to:\n{filepath}")
+        
+    def expected_arrivals(self):
+        """
+        Expected number of arrivals in a simulation run, from the arrival rates.
+        Used as the known mean of the control variate in replication experiments.
+        ============
+        RETURNS:
+        ============
+        - expected_arrivals: float
+            Expected total number of arrivals over all acuity levels.
+        ============
+        """
+        # arrivals are generated at the start of hours 0 to SIMULATION_DURATION-2
+        hours = np.arange(self.SIMULATION_DURATION-1) % 24
+        n_before_9 = np.count_nonzero(hours <= 9)
+        n_after_9 = len(hours) - n_before_9
+        return float(sum(n_before_9*self.ARRIVALS_BEFORE_9[acuity] + n_after_9*self.ARRIVALS_AFTER_9[acuity] 
+                         for acuity in self.acuities))
+    
+    def replication_kpis(self):
+        """
+        Key performance indicators of the last simulation run.
+        ============
+        RETURNS:
+        ============
+        - kpis: dict
+            'mean_wait' (over all patients), 'mean_wait_<acuity>' for each acuity level,
+            'reneging_rate' (fraction of Minor arrivals who reneged) and 'arrivals' (total arrivals).
+        ============
+        """
+        kpis = {}
+        acuity_index = self.patient_data.column("Acuity")
+        all_wait = self.patient_data.column("Wait_Time").astype(np.float64)
+        kpis["mean_wait"] = float(np.mean(all_wait)) if len(all_wait) else 0.
+        for ii, acuity in enumerate(self.acuities):
+            values = all_wait[acuity_index == ii]
+            kpis[f"mean_wait_{acuity}"] = float(np.mean(values)) if len(values) else 0.
+        arrivals = {acuity: float(np.sum(self.total_occupancy[acuity])) for acuity in self.acuities}
+        kpis["reneging_rate"] = self.reneged.get("Minor", 0)/arrivals["Minor"] if arrivals.get("Minor") else 0.
+        kpis["arrivals"] = sum(arrivals.values())
+        return kpis
+    
+    def _run_replication(self, NUM_BEDS, seed, antithetic):
+        """
+        Run one replication (or an antithetic pair, averaged) and return its KPIs.
+        """
+        if not antithetic:
+            self.set_seed(seed, separate_streams=True)
+            self.run_simulation(NUM_BEDS)
+            return self.replication_kpis()
+        pair = []
+        for use_complement in (False, True):
+            self.antithetic = use_complement
+            self.set_seed(seed, separate_streams=True)
+            self.run_simulation(NUM_BEDS)
+            pair.append(self.replication_kpis())
+        return {key: (pair[0][key] + pair[1][key])/2 for key in pair[0]}
+    
+    @staticmethod
+    def confidence_interval(values, confidence=0.95, controls=None, control_mean=None):
+        """
+        Confidence interval of the mean of replication outputs, optionally with a control variate.
+        ===========
+        ARGUMENTS:
+        ===========
+        - values: array-like
+            Output of each replication.
+        ============
+        OPTIONAL:
+        ============
+        - confidence: float
+            Confidence level of the interval. Default is 0.95.
+        - controls: array-like
+            Control variate of each replication, e.g. the number of arrivals. Default is None.
+        - control_mean: float
+            Known mean of the control variate. Required if controls is given.
+        ============
+        RETURNS:
+        ============
+        - interval: dict
+            'mean', 'half_width', 'n' and, with a control variate, its coefficient 'beta'.
+        ============
+        """
+        from scipy.stats import t
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        interval = {"n": n, "mean": float(values.mean()) if n else None, "half_width": float("inf")}
+        dof = n - 1
+        if controls is not None:
+            controls = np.asarray(controls, dtype=np.float64)
+            var_controls = controls.var(ddof=1) if n > 1 else 0.
+            beta = np.cov(values, controls)[0, 1]/var_controls if var_controls > 0 else 0.
+            values = values - beta*(controls - control_mean)
+            interval["mean"] = float(values.mean())
+            interval["beta"] = float(beta)
+            # one degree of freedom is used to estimate beta
+            dof = n - 2
+        if dof > 0:
+            interval["half_width"] = float(t.ppf((1+confidence)/2, dof)*values.std(ddof=1)/np.sqrt(n))
+        return interval
+    
+    def compare_configurations(self, configurations, kpi="mean_wait", half_width=None, confidence=0.95, 
+                               min_replications=10, max_replications=200, antithetic=False, control_variate=False, 
+                               seed=None):
+        """
+        Replicate the simulation for several bed configurations, using common random numbers,
+        until the confidence interval of the KPI (and of its difference to the first configuration)
+        is narrower than the requested half width.
+        ===========
+        ARGUMENTS:
+        ===========
+        - configurations: list
+            NUM_BEDS dict of each configuration to compare.
+        ============
+        OPTIONAL:
+        ============
+        - kpi: str
+            KPI to estimate, one of the keys of replication_kpis. Default is "mean_wait".
+        - half_width: float
+            Target half width of the confidence intervals. Replications are added until every 
+            interval is narrower or max_replications is reached. Default is None (run min_replications).
+        - confidence: float
+            Confidence level of the intervals. Default is 0.95.
+        - min_replications: int
+            Replications run before checking the stopping rule. Default is 10.
+        - max_replications: int
+            Maximum number of replications. Default is 200.
+        - antithetic: bool
+            Run each replication as an antithetic pair (U and 1-U) and average it. Default is False.
+        - control_variate: bool
+            Use the number of arrivals, with known mean, as control variate. Default is False.
+        - seed: int
+            Seed of the replications. Default is RANDOM_SEED.
+        ============
+        RETURNS:
+        ============
+        - results: dict
+            'estimates': interval (see confidence_interval) of the KPI for each configuration,
+            'differences': interval of the difference to the first configuration for the others,
+            'replications': the KPIs of every replication of each configuration.
+        ============
+        """
+        seed_sequence = np.random.SeedSequence(self.RANDOM_SEED if seed is None else seed)
+        control_mean = self.expected_arrivals() if control_variate else None
+        replications = [[] for _ in configurations]
+        show_progress, self.show_progress = self.show_progress, False
+        # replications reseed the generators, the simulation is handed back as it was given
+        state = (self.antithetic, self.rng, self.arrival_rng, self.stay_rng, self.patience_rng)
+        try:
+            while True:
+                # the same seed for every configuration gives common random numbers
+                replication_seed = seed_sequence.spawn(1)[0]
+                for config_replications, NUM_BEDS in zip(replications, configurations):
+                    config_replications.append(self._run_replication(NUM_BEDS, replication_seed, antithetic))
+                values = [np.array([rep[kpi] for rep in reps]) for reps in replications]
+                controls = np.array([rep["arrivals"] for rep in replications[0]]) if control_variate else None
+                estimates = [self.confidence_interval(v, confidence, controls, control_mean) for v in values]
+                # replications of each configuration share their random numbers, so differences are paired
+                differences = [self.confidence_interval(v - values[0], confidence) for v in values[1:]]
+                n = len(replications[0])
+                if n < min_replications:
+                    continue
+                widths = [est["half_width"] for est in estimates + differences]
+                if half_width is None or max(widths) <= half_width or n >= max_replications:
+                    break
+        finally:
+            self.show_progress = show_progress
+            self.antithetic, self.rng, self.arrival_rng, self.stay_rng, self.patience_rng = state
+        return {"estimates": estimates, "differences": differences, "replications": replications}
+    
+    def run_replications(self, NUM_BEDS, kpi="mean_wait", half_width=None, **kwargs):
+        """
+        Replicate the simulation for one bed configuration until the confidence interval of the KPI 
+        is narrower than the requested half width. Accepts the same options as compare_configurations.
+        ===========
+        ARGUMENTS:
+        ===========
+        - NUM_BEDS: dict
+            Number of beds for each acuity level.
+        ============
+        OPTIONAL:
+        ============
+        - kpi: str
+            KPI to estimate, one of the keys of replication_kpis. Default is "mean_wait".
+        - half_width: float
+            Target half width of the confidence interval. Default is None (run min_replications).
+        ============
+        RETURNS:
+        ============
+        - interval: dict
+            Interval of the KPI (see confidence_interval), with the KPIs of every replication under 'replications'.
+        ============
+        """
+        results = self.compare_configurations([NUM_BEDS], kpi=kpi, half_width=half_width, **kwargs)
+        return {**results["estimates"][0], "replications": results["replications"][0]}
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the engine is imported as simulation_base by the scripts and as python.simulation_base by the app
+sys.path[:0] = [os.path.join(ROOT, "python", "dash_app"), os.path.join(ROOT, "python"), ROOT]
+
+# the app reads its storage locations when its modules are imported, keep them out of the real ones
+_tmp = tempfile.mkdtemp(prefix="ed_simulation_tests_")
+for name in ["ED_CACHE_DIR", "ED_LIVE_CACHE_DIR", "ED_REPORT_DIR", "ED_API_SLOT_DIR"]:
+    os.environ.setdefault(name, os.path.join(_tmp, name.lower()))
+os.environ.setdefault("ED_SURROGATE_PATH", os.path.join(_tmp, "surrogate.npz"))
+
+LENGTH_OF_STAY = {"Major": 9, "Minor": 4, "Resus": 6}
+ARRIVALS_BEFORE_9 = {"Major": 6, "Minor": 4, "Resus": 1}
+ARRIVALS_AFTER_9 = {"Major": 16, "Minor": 12, "Resus": 2}
+NUM_BEDS = {"Major": 110, "Minor": 35, "Resus": 16}
+
+@pytest.fixture
+def make_simulation():
+    """
+    Factory of small simulations with the app's default parameters.
+    """
+    from simulation_base import EDSimulation
+    def make(days=3, **kwargs):
+        return EDSimulation(LENGTH_OF_STAY, ARRIVALS_BEFORE_9, ARRIVALS_AFTER_9, days*24, 4, 8, 
+                            show_progress=False, **kwargs)
+    return make
+
+@pytest.fixture
+def num_beds():
+    return dict(NUM_BEDS)
+
+@pytest.fixture
+def make_table_rows():
+    """
+    Factory of the rows of the app's parameter tables, as sent by the UI.
+    """
+    from utils.ref_parameters import ACUITIES, SIMULATION_PARAMETERS, SIMULATION_PARAMETERS_ACUITY
+    def make(days=1, start_date="2024-01-01"):
+        rows = [{'property': prop, 'value': value} for prop, value in SIMULATION_PARAMETERS.items()]
+        rows[0]['value'] = days
+        rows.append({'property': "START DATE", 'value': start_date})
+        rows_acuity = [{'acuity': acuity, **{key.lower().replace(' ', '_'): values[acuity] 
+                                             for key, values in SIMULATION_PARAMETERS_ACUITY.items()}}
+                       for acuity in ACUITIES]
+        return rows, rows_acuity
+    return make
+
+@pytest.fixture(scope="session")
+def callbacks():
+    """
+    Callbacks of the app by function name, unwrapped so that they can be called directly.
+    """
+    from app import create_app
+    app = create_app()
+    return {value['callback'].__wrapped__.__name__: value['callback'].__wrapped__ 
+            for value in app.callback_map.values() if 'callback' in value}
+
+@pytest.fixture
+def trigger():
+    """
+    Set the input that triggers the next callback called, as read from dash.callback_context.
+    """
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+    def set_trigger(prop_id, value=1):
+        context_value.set(AttributeDict(triggered_inputs=[{'prop_id': prop_id, 'value': value}]))
+    return set_trigger
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from models import batch_jobs
+
+@pytest.fixture(scope="module")
+def client():
+    from app import create_app
+    return create_app().server.test_client()
+
+@pytest.fixture
+def pending(monkeypatch):
+    """
+    Replace the admission semaphore of the worker, to control how many jobs it accepts.
+    """
+    def set_available(n):
+        semaphore = threading.BoundedSemaphore(batch_jobs.API_MAX_PENDING)
+        for _ in range(batch_jobs.API_MAX_PENDING - n):
+            semaphore.acquire()
+        monkeypatch.setattr(batch_jobs, "_pending", semaphore)
+        return semaphore
+    return set_available
+
+def wait_for(client, job_id, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f'/api/simulations/{job_id}').get_json()
+        if status['status'] not in ('queued', 'running'):
+            return status
+        time.sleep(0.2)
+    raise TimeoutError(job_id)
+
+@pytest.mark.parametrize("body", [
+    [1, 2],
+    {'scenarios': []},
+    {'scenarios': {}},
+    {'scenarios': [{}], 'timeout': 0},
+    {'scenarios': [{}], 'timeout': 'soon'},
+    {'scenarios': [{}, {'duration_days': -1}]},
+    {'acuities': {'Major': {'number_of_available_beds': 0}}},
+])
+def test_invalid_requests_are_answered_with_400(client, body):
+    response = client.post('/api/simulations', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_unknown_jobs_are_answered_with_404(client):
+    assert client.get(f'/api/simulations/{"0"*32}').status_code == 404
+    assert client.get(f'/api/simulations/{"0"*32}/result').status_code == 404
+
+def test_result_of_an_unfinished_job_is_answered_with_409(client):
+    job_id = "1"*32
+    batch_jobs._set_state(job_id, status='queued')
+    response = client.get(f'/api/simulations/{job_id}/result')
+    assert response.status_code == 409
+    assert response.get_json()['status'] == 'queued'
+
+def test_full_queue_is_answered_with_429(client, pending):
+    semaphore = pending(1)
+    response = client.post('/api/simulations', json={'scenarios': [{}, {}]})
+    assert response.status_code == 429
+    assert response.headers['Retry-After']
+    # batches are admitted all or nothing, the free slot is still free
+    assert semaphore.acquire(blocking=False)
+
+def test_failed_submission_releases_its_slot(monkeypatch, pending):
+    semaphore = pending(1)
+    def broken_executor(replace=False):
+        raise RuntimeError("no pool")
+    monkeypatch.setattr(batch_jobs, "_get_executor", broken_executor)
+    job_id, = batch_jobs.submit_jobs([{}])
+    assert batch_jobs.job_status(job_id)['status'] == 'failed'
+    assert semaphore.acquire(blocking=False)
+
+def test_job_runs_to_a_result(client):
+    response = client.post('/api/simulations', json={'duration_days': 1})
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job['url'] == f"/api/simulations/{job['job_id']}"
+    status = wait_for(client, job['job_id'])
+    assert status['status'] == 'done'
+    result = client.get(status['result_url']).get_json()
+    assert result['length'] == 24 and result['interval_hours'] == 1
+    assert all(len(values) == 24 for series in result['series'].values() for values in series.values())
+    assert set(result['summary']) == set(result['series'])
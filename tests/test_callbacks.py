@@ -0,0 +1,92 @@
+import pytest
+
+import callbacks as callbacks_module
+
+@pytest.fixture
+def started(monkeypatch):
+    # scenarios of the live runs started by the callbacks, without running them
+    scenarios = []
+    monkeypatch.setattr(callbacks_module, "start_live_run", lambda scenario: scenarios.append(scenario) or "a"*32)
+    return scenarios
+
+def add_simulation(callbacks, trigger, rows, rows_acuity, simulation_data=None):
+    trigger('add-simulation-button.n_clicks')
+    return callbacks['manage_simulations'](1, [], rows, rows_acuity, [], "2024-01-01", simulation_data, {})
+
+def test_add_starts_a_validated_live_run(callbacks, trigger, make_table_rows, started):
+    rows, rows_acuity = make_table_rows(days=2)
+    store, alert, live_run, interval_disabled, *_ = add_simulation(callbacks, trigger, rows[:3], rows_acuity)
+    assert alert is None and live_run['run_id'] == "a"*32 and interval_disabled is False
+    assert started[0]['duration_days'] == 2 and started[0]['start_date'] == "2024-01-01"
+
+@pytest.mark.parametrize("cell, value, message", [
+    ('number_of_available_beds', 0, "'Major.number_of_available_beds' must be a positive integer"),
+    ('length_of_stay', None, "'Major.length_of_stay' must be a non-negative number"),
+    ('arrivals_after_9', 1000, "at most"),
+])
+def test_add_reports_bad_cells_without_starting_a_run(callbacks, trigger, make_table_rows, started, cell, value, message):
+    rows, rows_acuity = make_table_rows()
+    rows_acuity[0][cell] = value
+    store, alert, live_run, *_ = add_simulation(callbacks, trigger, rows[:3], rows_acuity)
+    assert message in str(alert.children)
+    assert live_run is callbacks_module.no_update and not started
+
+def test_add_rejects_durations_beyond_the_limit(callbacks, trigger, make_table_rows, started):
+    from models.simulation import MAX_DURATION_DAYS
+    rows, rows_acuity = make_table_rows(days=MAX_DURATION_DAYS + 1)
+    alert = add_simulation(callbacks, trigger, rows[:3], rows_acuity)[1]
+    assert "'duration_days' must be an integer" in str(alert.children) and not started
+
+def store_entries(n):
+    # entries of the simulation data store, with made up KPIs
+    properties = ['Bed Usage', 'Queue Lengths', 'Total Occupancy', 'Average Wait Time']
+    return [{'index': ii, 'result_id': f"result-{ii}", 
+             'kpis': {prop: {acuity: float(ii + jj) for jj, acuity in enumerate(['Major', 'Minor', 'Resus'])} for prop in properties},
+             'rows': [], 'rows_acuity': [{'acuity': 'Major', 'number_of_available_beds': 100 + ii}], 'columns_acuity': []}
+            for ii in range(n)]
+
+@pytest.fixture
+def rendered(monkeypatch):
+    # panels built by update_simulation_page, as (index, number, result) without drawing them
+    monkeypatch.setattr(callbacks_module, "load_result", lambda result_id: {'id': result_id})
+    monkeypatch.setattr(callbacks_module, "create_simulation_view", 
+                        lambda index, number, result, *args: (index, number, result['id']))
+
+@pytest.mark.parametrize("n_simulations, active_page, expected_page, expected_numbers", [
+    (0, 1, 1, []),
+    (2, None, 1, [1, 2]),
+    (7, 1, 1, [1, 2, 3]),
+    (7, 3, 3, [7]),
+    # a page removed with its last simulation falls back to the last page
+    (6, 3, 2, [4, 5, 6]),
+])
+def test_only_the_active_page_is_built(callbacks, rendered, n_simulations, active_page, expected_page, expected_numbers):
+    from utils.ref_parameters import SIMULATIONS_PER_PAGE
+    assert SIMULATIONS_PER_PAGE == 3
+    children, max_page, page = callbacks['update_simulation_page'](store_entries(n_simulations), active_page)
+    assert max_page == max(1, -(-n_simulations//3)) and page == expected_page
+    assert [number for _, number, _ in children] == expected_numbers
+    assert [result_id for _, _, result_id in children] == [f"result-{number-1}" for number in expected_numbers]
+
+def test_comparison_has_one_trace_per_property_and_acuity(callbacks):
+    figure = callbacks['update_comparison_graph'](store_entries(40), 'comparison-tab')
+    assert len(figure.data) == 4*3
+    major_bed_usage = figure.data[0]
+    assert major_bed_usage.name == 'Major' and len(major_bed_usage.x) == 40
+    assert list(major_bed_usage.y[:3]) == [0., 1., 2.]
+    assert major_bed_usage.customdata[1] == "Major: 101 beds"
+
+def test_comparison_is_only_drawn_when_visible(callbacks):
+    assert callbacks['update_comparison_graph'](store_entries(3), 'simulations-tab') is callbacks_module.no_update
+    assert len(callbacks['update_comparison_graph'](None, 'comparison-tab').data[0].x) == 0
+
+def test_remove_takes_the_simulation_out_of_the_store(callbacks, trigger):
+    trigger('{"index":1,"type":"remove-button"}.n_clicks')
+    store = callbacks['manage_simulations'](None, [1], [], [], [], "2024-01-01", store_entries(3), {})[0]
+    assert [sd['index'] for sd in store] == [0, 2]
+
+def test_add_is_refused_beyond_the_maximum(callbacks, trigger, make_table_rows, started):
+    from utils.ref_parameters import MAX_SIMULATIONS
+    rows, rows_acuity = make_table_rows()
+    alert = add_simulation(callbacks, trigger, rows[:3], rows_acuity, store_entries(MAX_SIMULATIONS))[1]
+    assert f"up to {MAX_SIMULATIONS} simulations" in str(alert.children) and not started
@@ -0,0 +1,71 @@
+import numpy as np
+
+from simulation_base import ChunkedSeries, EDSimulation, PatientRecords
+
+def test_values_survive_moving_between_chunks(tmp_path):
+    series = ChunkedSeries(str(tmp_path / "series.bin"), length=50, chunk_size=8)
+    expected = np.zeros(50, dtype=np.int32)
+    # forward, backward and across the shorter last chunk
+    for index in [0, 7, 8, 3, 49, 45, 20, 0, 42]:
+        series[index] += index + 1
+        expected[index] += index + 1
+    assert [series[ii] for ii in range(50)] == expected.tolist()
+    np.testing.assert_array_equal(np.asarray(series), expected)
+    series.close()
+
+def test_file_is_readable_by_memmap_after_close(tmp_path):
+    filepath = str(tmp_path / "series.bin")
+    series = ChunkedSeries(filepath, length=20, chunk_size=6)
+    for index in range(20):
+        series[index] = 2*index
+    series.close()
+    np.testing.assert_array_equal(np.memmap(filepath, dtype=np.int32, mode="r"), 2*np.arange(20))
+    np.testing.assert_array_equal(series[5:8], [10, 12, 14])
+
+def test_chunk_larger_than_series(tmp_path):
+    series = ChunkedSeries(str(tmp_path / "series.bin"), length=5, chunk_size=168)
+    series[4] = 7
+    assert len(series) == 5
+    assert np.asarray(series).tolist() == [0, 0, 0, 0, 7]
+    series.close()
+
+def test_stored_run_matches_in_memory_run(tmp_path, make_simulation, num_beds):
+    in_memory = make_simulation()
+    in_memory.run_simulation(num_beds)
+    stored = make_simulation(storage_dir=str(tmp_path), storage_chunk=10)
+    stored.run_simulation(num_beds)
+    loaded = EDSimulation.load_series(stored.run_dir)
+    for name in EDSimulation.series_names:
+        for acuity in in_memory.acuities:
+            np.testing.assert_array_equal(loaded[name][acuity], getattr(in_memory, name)[acuity])
+    assert stored.summary_statistics() == in_memory.summary_statistics()
+    patient_data = EDSimulation.load_patient_data(stored.run_dir)
+    assert patient_data.equals(in_memory.patient_data.to_dataframe())
+    assert patient_data["Acuity"].tolist()[:3] == [patient["Acuity"] for patient in in_memory.patient_data][:3]
+    stored.close_series()
+
+def test_patient_records_round_trip_across_chunks(tmp_path):
+    records = [PatientRecords(["Major", "Minor"], str(tmp_path), chunk_size=4), PatientRecords(["Major", "Minor"], chunk_size=4)]
+    for patient_id in range(1, 11):
+        for table in records:
+            table.append(patient_id, patient_id % 2, patient_id/2, patient_id/4)
+        # reading in the middle of a chunk must not lose or repeat records
+        if patient_id in (3, 6):
+            assert records[0].column("Id").tolist() == list(range(1, patient_id+1))
+    for table in records:
+        assert len(table) == 10
+        np.testing.assert_array_equal(table.column("Wait_Time", 8), [9/4, 10/4])
+        assert list(table)[0] == {"Id": 1, "Acuity": "Minor", "Arrival_Time": 0.5, "Wait_Time": 0.25}
+    assert np.fromfile(str(tmp_path / "Id.bin"), dtype=np.int32).tolist() == list(range(1, 11))
+
+def test_each_run_writes_its_own_directory(tmp_path, make_simulation, num_beds):
+    simulation = make_simulation(days=1, storage_dir=str(tmp_path))
+    simulation.run_simulation(num_beds)
+    first_run, first = simulation.run_dir, np.array(EDSimulation.load_series(simulation.run_dir)["bed_usage"]["Major"])
+    loaded = EDSimulation.load_series(first_run)
+    simulation.run_simulation({**num_beds, "Major": 1})
+    # the files of the first run are left as they were, for the processes still reading them
+    assert simulation.run_dir != first_run
+    np.testing.assert_array_equal(loaded["bed_usage"]["Major"], first)
+    assert np.asarray(simulation.bed_usage["Major"]).max() == 1
+    simulation.close_series()
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize("distribution", ["poisson", "lognormal", "gamma"])
+@pytest.mark.parametrize("antithetic", [None, False, True])
+def test_stays_have_the_requested_mean_and_spread(make_simulation, distribution, antithetic):
+    simulation = make_simulation(los_distribution=distribution, antithetic=antithetic)
+    stays = simulation.draw_stay("Major", 100000)
+    assert stays.mean() == pytest.approx(9., rel=0.02)
+    # by default the spread matches the Poisson distribution of the hourly engine
+    assert stays.std() == pytest.approx(3., rel=0.03)
+
+@pytest.mark.parametrize("distribution", ["lognormal", "gamma"])
+def test_coefficient_of_variation(make_simulation, distribution):
+    stays = make_simulation(los_distribution=distribution, los_cv=0.8).draw_stay("Minor", 100000)
+    assert stays.std()/stays.mean() == pytest.approx(0.8, rel=0.05)
+    assert np.all(stays > 0)
+
+@pytest.mark.parametrize("distribution", ["poisson", "lognormal", "gamma"])
+def test_antithetic_stays_are_complementary(make_simulation, distribution):
+    draws = []
+    for antithetic in (False, True):
+        simulation = make_simulation(los_distribution=distribution, antithetic=antithetic)
+        simulation.set_seed(5, separate_streams=True)
+        draws.append(simulation.draw_stay("Major", 20000))
+    assert np.corrcoef(*draws)[0, 1] < -0.8
+
+def test_unknown_distribution(make_simulation):
+    with pytest.raises(ValueError, match="los_distribution"):
+        make_simulation(los_distribution="weibull").draw_stay("Major", 3)
+
+def test_resolution_must_divide_the_duration(make_simulation, num_beds):
+    with pytest.raises(ValueError, match="multiple of resolution"):
+        make_simulation(resolution=5).run_simulation(num_beds)
+
+def test_continuous_run_is_binned_at_the_resolution(make_simulation, num_beds):
+    simulation = make_simulation(days=2, continuous=True, resolution=0.25)
+    simulation.run_simulation(num_beds)
+    assert simulation.n_bins == 2*24*4
+    assert all(len(simulation.bed_usage[acuity]) == simulation.n_bins for acuity in simulation.acuities)
+    arrival_times = np.array([patient["Arrival_Time"] for patient in simulation.patient_data])
+    # patients arrive within the hours, not at their start
+    assert np.mean(arrival_times != np.floor(arrival_times)) > 0.99
+    # every recorded patient is counted in the bin of its arrival, patients still in a bed are not recorded yet
+    arrivals = sum(simulation.total_occupancy[acuity] for acuity in simulation.acuities)
+    recorded = np.bincount((arrival_times*4).astype(int), minlength=simulation.n_bins)
+    assert np.all(arrivals >= recorded)
+
+def test_continuous_arrivals_follow_the_rates(make_simulation, num_beds):
+    simulation = make_simulation(days=4, continuous=True)
+    simulation.run_simulation(num_beds)
+    arrivals = sum(simulation.total_occupancy[acuity].sum() for acuity in simulation.acuities)
+    expected = simulation.expected_arrivals()
+    assert abs(arrivals - expected) < 4*np.sqrt(expected)
+
+def test_wait_time_series_stay_aligned_with_the_bins(make_simulation, num_beds):
+    simulation = make_simulation(days=2, continuous=True, resolution=0.25)
+    simulation.run_simulation(num_beds)
+    hourly = simulation.calculate_hourly_wait_time()
+    frame = simulation.calculate_average_wait_time(simulation.patient_data, simulation.resolution)
+    bins = (np.array([patient["Arrival_Time"] for patient in simulation.patient_data])*4).astype(int)
+    # with 15 minute bins some bins have no arrivals of an acuity level, they must not shift the series
+    assert len(frame) == len(hourly["Major"]) == bins.max() + 1
+    for acuity in simulation.acuities:
+        np.testing.assert_allclose(frame[acuity].values, hourly[acuity])
+
+def test_app_output_keeps_each_wait_time_at_its_time():
+    from models.simulation import default_scenario, run_scenario
+    scenario = default_scenario()
+    scenario.update(duration_days=2, continuous=True, resolution_minutes=15)
+    data = run_scenario(scenario)['data']
+    n_bins = 2*24*4
+    assert len(data['Time']) == len(data['Average Wait Time']) == 3*n_bins
+    times = data['Time'][:n_bins]
+    assert (times[1] - times[0]).total_seconds() == 15*60
+    waits = data['Average Wait Time'][:n_bins]
+    # values up to the last arrival, None after it
+    n_values = sum(value is not None for value in waits)
+    assert all(value is not None for value in waits[:n_values])
+
+def test_published_updates_cover_every_bin_once(make_simulation, num_beds):
+    updates = []
+    simulation = make_simulation(days=2, continuous=True, resolution=0.5, publisher=updates.append, publish_interval=0)
+    simulation.run_simulation(num_beds)
+    assert all(update['resolution'] == 0.5 for update in updates)
+    assert [update['start'] for update in updates[1:]] == [update['stop'] for update in updates[:-1]]
+    assert updates[0]['start'] == 0 and updates[-1]['stop'] == (2*24-1)*2
+    for update in updates:
+        assert len(update['Bed Usage']['Major']) == update['stop'] - update['start']
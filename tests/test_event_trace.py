@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from simulation_base import EventTrace
+
+def record_events(trace, n):
+    for ii in range(n):
+        trace.record(float(ii), ii, 0, EventTrace.ARRIVE)
+
+def test_ring_buffer_keeps_the_latest_records_in_order():
+    trace = EventTrace(capacity=8)
+    record_events(trace, 5)
+    assert trace.events()["patient_id"].tolist() == [0, 1, 2, 3, 4]
+    for ii in range(5, 21):
+        trace.record(float(ii), ii, 0, EventTrace.ARRIVE)
+    assert trace.events()["patient_id"].tolist() == list(range(13, 21))
+
+def test_file_keeps_every_record(tmp_path):
+    filepath = str(tmp_path / "trace.bin")
+    trace = EventTrace(capacity=8, filepath=filepath)
+    record_events(trace, 21)
+    # full buffers are written as they fill, the partial one on flush
+    assert len(EventTrace.read(filepath)) == 16
+    trace.flush()
+    trace.flush()
+    events = EventTrace.read(filepath)
+    assert events["patient_id"].tolist() == list(range(21))
+    assert events["time"].tolist() == [float(ii) for ii in range(21)]
+    assert trace.events()["patient_id"].tolist() == list(range(21))
+
+def test_empty_file_reads_as_no_events(tmp_path):
+    filepath = str(tmp_path / "trace.bin")
+    EventTrace(filepath=filepath)
+    assert len(EventTrace.read(filepath)) == 0
+
+@pytest.mark.parametrize("sample_rate", [0., 0.1, 1.])
+def test_sampling_keeps_the_requested_fraction(sample_rate):
+    trace = EventTrace(sample_rate=sample_rate)
+    sampled = np.mean([trace.sampled(patient_id) for patient_id in range(1, 20001)])
+    assert sampled == pytest.approx(sample_rate, abs=0.01)
+
+def test_sampled_patients_have_all_their_events(make_simulation, num_beds):
+    simulation = make_simulation(trace=EventTrace(sample_rate=0.2))
+    simulation.run_simulation(num_beds)
+    events = simulation.trace.events()
+    assert len(events) > 0
+    # patients still waiting or in a bed when the simulation ends have not all their events yet
+    complete = [[EventTrace.ARRIVE, EventTrace.ASSIGN, EventTrace.DEPART], [EventTrace.ARRIVE, EventTrace.RENEGE]]
+    allowed = complete + [[EventTrace.ARRIVE], [EventTrace.ARRIVE, EventTrace.ASSIGN]]
+    stays = {}
+    n_complete = 0
+    for patient_id in np.unique(events["patient_id"]):
+        patient_events = events[events["patient_id"] == patient_id]
+        assert patient_events["event"].tolist() in allowed
+        assert np.all(np.diff(patient_events["time"]) >= 0)
+        assert len(np.unique(patient_events["acuity"])) == 1
+        n_complete += patient_events["event"].tolist() in complete
+        beds = patient_events["bed"][patient_events["event"] != EventTrace.ARRIVE]
+        if patient_events["event"][-1] == EventTrace.RENEGE:
+            assert simulation.acuities[patient_events["acuity"][0]] == "Minor" and beds[0] == -1
+        elif len(beds):
+            acuity = simulation.acuities[patient_events["acuity"][0]]
+            assert np.all(beds == beds[0]) and 0 <= beds[0] < num_beds[acuity]
+            end = patient_events["time"][2] if len(beds) == 2 else np.inf
+            stays.setdefault((acuity, beds[0]), []).append((patient_events["time"][1], end))
+    assert n_complete > 0
+    # a bed is given to a patient only once the previous one left it
+    for intervals in stays.values():
+        intervals.sort()
+        assert all(start >= previous_end for (_, previous_end), (start, _) in zip(intervals[:-1], intervals[1:]))
+
+def test_run_writes_the_whole_trace_to_its_file(tmp_path, make_simulation, num_beds):
+    filepath = str(tmp_path / "trace.bin")
+    simulation = make_simulation(trace=EventTrace(capacity=1000, filepath=filepath))
+    simulation.run_simulation(num_beds)
+    assert simulation.trace.position % 1000 != 0
+    assert len(EventTrace.read(filepath)) == simulation.trace.position
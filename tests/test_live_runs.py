@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from models import live_runs
+import models.surrogate as surrogate_module
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch, tmp_path):
+    # each test reads and writes its own live cache, and does not train the surrogate
+    from cachelib import FileSystemCache
+    cache = FileSystemCache(str(tmp_path), threshold=0, default_timeout=0)
+    monkeypatch.setattr(live_runs, "_cache", cache)
+    monkeypatch.setattr(surrogate_module, "update_surrogate", lambda *args: False)
+    return cache
+
+@pytest.fixture
+def run(monkeypatch, make_table_rows):
+    """
+    Run a simulation in this process, as a pool process would, publishing every simulated hour.
+    """
+    from models.simulation import scenario_from_rows, validate_scenario
+    from models.simulation_app import AppSimulation
+    monkeypatch.setattr(AppSimulation, "publish_interval", 0.)
+    def run_live(run_id, days=1):
+        rows, rows_acuity = make_table_rows(days=days)
+        live_runs._set_state(run_id, status='running', updates=0)
+        live_runs._run(run_id, validate_scenario(scenario_from_rows(rows + rows_acuity)))
+    return run_live
+
+def test_updates_are_read_from_the_offset_and_then_deleted(run, cache):
+    run_id = "a"*32
+    run(run_id, days=2)
+    state = cache.get(f"live:{run_id}")
+    assert state['status'] == 'done' and state['updates'] > 2
+    n_updates = state['updates']
+    state, updates = live_runs.read_live_run(run_id, offset=2)
+    assert state['result_id'] and len(updates) == n_updates - 2
+    # the updates follow each other, with one timestamp per bin
+    assert [update['start'] for update in updates[1:]] == [update['stop'] for update in updates[:-1]]
+    assert all(len(update['Time']) == update['stop'] - update['start'] for update in updates)
+    assert not any(cache.has(f"live:{run_id}:{ii}") for ii in range(2, n_updates))
+    # the updates not read yet are kept, the ones read are not sent again
+    assert len(live_runs.read_live_run(run_id)[1]) == 2
+    assert live_runs.read_live_run(run_id)[1] == []
+
+def test_abort_stops_the_run_at_its_next_update(run, cache):
+    run_id = "b"*32
+    live_runs.abort_live_run(run_id)
+    run(run_id)
+    state, updates = live_runs.read_live_run(run_id)
+    assert state['status'] == 'aborted' and len(updates) == 1
+    # the request is dropped with the run, so that it cannot outlive it
+    assert not cache.has(f"live:{run_id}:abort")
+
+def test_invalid_scenario_fails_the_run(cache):
+    run_id = "c"*32
+    live_runs._set_state(run_id, status='running', updates=0)
+    live_runs._run(run_id, {'start_date': "2024-01-01"})
+    state, updates = live_runs.read_live_run(run_id)
+    assert state['status'] == 'failed' and "KeyError" in state['error'] and updates == []
+
+def test_run_without_heartbeat_is_reported_as_failed(cache, monkeypatch):
+    run_id = "d"*32
+    live_runs._set_state(run_id, status='running', updates=0)
+    live_runs._heartbeat(run_id)
+    assert live_runs.read_live_run(run_id)[0]['status'] == 'running'
+    cache.set(f"live:{run_id}:updated", time.time() - live_runs.LIVE_RUN_STALE - 1)
+    state = live_runs.read_live_run(run_id)[0]
+    assert state['status'] == 'failed' and "stopped" in state['error']
+    # the failure is stored, a late heartbeat does not bring the run back
+    live_runs._heartbeat(run_id)
+    assert live_runs.read_live_run(run_id)[0]['status'] == 'failed'
+
+def test_finished_runs_are_not_stale(cache):
+    run_id = "e"*32
+    live_runs._set_state(run_id, status='done', updates=0, result_id="result")
+    assert live_runs.read_live_run(run_id)[0]['status'] == 'done'
+
+def test_unknown_run(cache):
+    assert live_runs.read_live_run("f"*32) == ({'status': 'unknown', 'updates': 0}, [])
+
+def test_dead_process_marks_the_run_as_failed(cache):
+    run_id = "0"*32
+    live_runs._set_state(run_id, status='running', updates=3)
+    live_runs._active.add(run_id)
+    future = Future()
+    future.set_exception(RuntimeError("A process in the process pool was terminated abruptly"))
+    live_runs._run_done(run_id, future)
+    assert run_id not in live_runs._active
+    state = cache.get(f"live:{run_id}")
+    assert state['status'] == 'failed' and "terminated abruptly" in state['error'] and state['updates'] == 3
+
+def test_finished_process_keeps_the_state_of_its_run(cache):
+    run_id = "1"*32
+    live_runs._set_state(run_id, status='done', updates=3, result_id="result")
+    future = Future()
+    future.set_result(None)
+    live_runs._run_done(run_id, future)
+    assert cache.get(f"live:{run_id}")['status'] == 'done'
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from scipy.stats import t
+
+from simulation_base import EDSimulation
+
+def test_confidence_interval_of_the_mean():
+    interval = EDSimulation.confidence_interval([1., 2., 3., 4., 5.], confidence=0.95)
+    assert interval["n"] == 5
+    assert interval["mean"] == pytest.approx(3.)
+    assert interval["half_width"] == pytest.approx(t.ppf(0.975, 4)*np.std([1, 2, 3, 4, 5], ddof=1)/np.sqrt(5))
+
+def test_confidence_interval_needs_two_values():
+    assert EDSimulation.confidence_interval([1.])["half_width"] == float("inf")
+
+def test_control_variate_removes_the_correlated_noise():
+    rng = np.random.default_rng(0)
+    controls = rng.normal(100., 10., size=50)
+    values = 2*controls + rng.normal(0., 1., size=50)
+    plain = EDSimulation.confidence_interval(values)
+    controlled = EDSimulation.confidence_interval(values, controls=controls, control_mean=100.)
+    assert controlled["beta"] == pytest.approx(2., abs=0.1)
+    assert controlled["mean"] == pytest.approx(200., abs=1.)
+    assert controlled["half_width"] < plain["half_width"]/5
+
+def test_antithetic_poisson_draws_are_complementary(make_simulation):
+    simulation = make_simulation()
+    draws = {}
+    for antithetic in (False, True):
+        simulation.antithetic = antithetic
+        rng = np.random.default_rng(1)
+        draws[antithetic] = np.array([simulation.draw_poisson(9., rng)[0] for _ in range(5000)])
+    for values in draws.values():
+        assert values.mean() == pytest.approx(9., abs=0.2)
+        assert values.var() == pytest.approx(9., rel=0.1)
+    assert np.corrcoef(draws[False], draws[True])[0, 1] < -0.9
+
+def test_stopping_rule_runs_min_replications_without_target(make_simulation, num_beds):
+    simulation = make_simulation(days=1)
+    result = simulation.run_replications(num_beds, min_replications=3, seed=1)
+    assert result["n"] == 3
+    assert len(result["replications"]) == 3
+
+def test_stopping_rule_stops_once_the_target_is_met(make_simulation, num_beds):
+    simulation = make_simulation(days=1)
+    wide = simulation.run_replications(num_beds, half_width=1e6, min_replications=3, max_replications=6, seed=1)
+    assert wide["n"] == 3
+    unreachable = simulation.run_replications(num_beds, half_width=0., min_replications=3, max_replications=5, seed=1)
+    assert unreachable["n"] == 5
+
+def test_common_random_numbers_pair_identical_configurations(make_simulation, num_beds):
+    simulation = make_simulation(days=1)
+    results = simulation.compare_configurations([num_beds, dict(num_beds)], min_replications=3, seed=2)
+    assert results["differences"][0]["mean"] == 0.
+    assert results["differences"][0]["half_width"] == 0.
+    # the simulation is left as it was
+    assert simulation.antithetic is None
+    assert simulation.show_progress is False
+
+def test_antithetic_pairs_are_averaged(make_simulation, num_beds):
+    simulation = make_simulation(days=1)
+    result = simulation.run_replications(num_beds, kpi="arrivals", min_replications=3, antithetic=True, seed=3)
+    assert result["n"] == 3
+    assert simulation.antithetic is None
+
+def test_expected_arrivals_match_simulated_arrivals(make_simulation, num_beds):
+    simulation = make_simulation(days=1)
+    result = simulation.run_replications(num_beds, kpi="arrivals", min_replications=20, seed=4)
+    standard_error = np.std([rep["arrivals"] for rep in result["replications"]], ddof=1)/np.sqrt(20)
+    assert abs(result["mean"] - simulation.expected_arrivals()) < 4*standard_error
+
+def test_replications_leave_the_generators_and_antithetic_as_they_were(make_simulation, num_beds):
+    simulation = make_simulation(days=1)
+    simulation.set_seed(7, separate_streams=True)
+    simulation.antithetic = False
+    generators = (simulation.rng, simulation.arrival_rng, simulation.stay_rng, simulation.patience_rng)
+    expected = np.random.default_rng(np.random.SeedSequence(7).spawn(3)[1]).random(3)
+    simulation.compare_configurations([num_beds], min_replications=2, antithetic=True, seed=5)
+    assert simulation.antithetic is False
+    assert (simulation.rng, simulation.arrival_rng, simulation.stay_rng, simulation.patience_rng) == generators
+    # the streams continue where they were, rather than being reseeded
+    assert np.array_equal(simulation.stay_rng.random(3), expected)
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+
+import pytest
+
+from utils import report_jobs
+from utils.report_jobs import REPORT_DIR, report_path, report_status, submit_report
+
+@pytest.fixture(scope="module")
+def client():
+    from app import create_app
+    return create_app().server.test_client()
+
+@pytest.fixture
+def simulations(make_table_rows):
+    """
+    Two stored simulations, as entries of the simulation data store.
+    """
+    from models.result_store import save_result
+    from models.simulation import compute_kpis, run_scenario, scenario_from_rows
+    from utils.ref_parameters import SIMULATION_PARAMETERS_ACUITY
+    # columns of the acuity table, as sent by the UI
+    columns_acuity = [{'name': 'ACUITY', 'id': 'acuity'}] + [{'name': key, 'id': key.lower().replace(' ', '_')} 
+                                                             for key in SIMULATION_PARAMETERS_ACUITY]
+    entries = []
+    for index, days in enumerate([1, 2]):
+        rows, rows_acuity = make_table_rows(days=days)
+        result = run_scenario(scenario_from_rows(rows + rows_acuity))
+        entries.append({'index': index, 'result_id': save_result(result), 'kpis': compute_kpis(result['summary']),
+                        'rows': rows, 'rows_acuity': rows_acuity, 'columns_acuity': columns_acuity})
+    return entries
+
+def wait_for(job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while report_status(job_id) == 'pending':
+        if time.monotonic() > deadline:
+            raise TimeoutError(job_id)
+        time.sleep(0.1)
+    return report_status(job_id)
+
+def test_build_report_writes_a_pdf(tmp_path, simulations):
+    from models.result_store import load_result
+    from utils.report import build_report
+    filepath = str(tmp_path / "report.pdf")
+    build_report(simulations, [load_result(sd['result_id']) for sd in simulations], filepath)
+    with open(filepath, "rb") as f:
+        assert f.read(5) == b"%PDF-"
+    # results that are no longer stored are left out
+    build_report(simulations, [None, None], str(tmp_path / "empty.pdf"))
+    assert os.path.getsize(tmp_path / "empty.pdf") < os.path.getsize(filepath)
+
+def test_report_is_pending_then_done(client, simulations, monkeypatch):
+    from utils import report
+    release = threading.Event()
+    build_report = report.build_report
+    def slow_build_report(*args):
+        release.wait(10)
+        build_report(*args)
+    monkeypatch.setattr(report, "build_report", slow_build_report)
+    job_id = submit_report(simulations)
+    assert report_status(job_id) == 'pending'
+    assert client.get(f'/report/{job_id}').get_json() == {'job_id': job_id, 'status': 'pending', 'url': None}
+    assert client.get(f'/report/{job_id}/pdf').status_code == 404
+    release.set()
+    assert wait_for(job_id) == 'done'
+    assert client.get(f'/report/{job_id}').get_json()['url'] == f'/report/{job_id}/pdf'
+    response = client.get(f'/report/{job_id}/pdf')
+    assert response.status_code == 200 and response.mimetype == 'application/pdf'
+    assert response.data.startswith(b"%PDF-")
+    response.close()
+    assert not os.path.exists(os.path.join(REPORT_DIR, job_id + ".pending"))
+
+def test_report_that_raises_has_failed(client, simulations, monkeypatch):
+    from utils import report
+    def fail(*args):
+        raise RuntimeError("no fonts")
+    monkeypatch.setattr(report, "build_report", fail)
+    job_id = submit_report(simulations)
+    assert wait_for(job_id) == 'failed'
+    assert client.get(f'/report/{job_id}').get_json()['status'] == 'failed'
+    assert client.get(f'/report/{job_id}/pdf').status_code == 404
+    assert not os.path.exists(report_path(job_id))
+
+def test_report_pending_for_too_long_has_failed():
+    # e.g. the worker building it was stopped
+    job_id = "b"*32
+    pending_path = os.path.join(REPORT_DIR, job_id + ".pending")
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    open(pending_path, "w").close()
+    assert report_status(job_id) == 'pending'
+    stale = time.time() - report_jobs.REPORT_TIMEOUT - 1
+    os.utime(pending_path, (stale, stale))
+    assert report_status(job_id) == 'failed'
+
+def test_expired_reports_are_removed_on_submit(simulations):
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    expired = os.path.join(REPORT_DIR, "c"*32 + ".pdf")
+    open(expired, "w").close()
+    old = time.time() - report_jobs.REPORT_MAX_AGE - 1
+    os.utime(expired, (old, old))
+    wait_for(submit_report(simulations[:1]))
+    assert not os.path.exists(expired)
+
+@pytest.mark.parametrize("job_id", ["..", "d"*31, "D"*32, "d"*32 + ".pdf", "../" + "d"*32])
+def test_invalid_job_ids_are_rejected(job_id):
+    with pytest.raises(ValueError):
+        report_path(job_id)
+    assert report_status(job_id) == 'unknown'
+
+@pytest.mark.parametrize("path", ["/report/{}", "/report/{}/pdf"])
+@pytest.mark.parametrize("job_id", ["e"*32, "not-a-report"])
+def test_unknown_reports_are_not_found(client, path, job_id):
+    assert client.get(path.format(job_id)).status_code == 404
@@ -0,0 +1,51 @@
+import pytest
+
+from models.simulation import (MAX_ARRIVALS_PER_HOUR, MAX_DURATION_DAYS, default_scenario, scenario_from_rows, 
+                               validate_scenario)
+
+def test_missing_parameters_take_the_defaults():
+    scenario = validate_scenario({'duration_days': 2, 'acuities': {'Minor': {'number_of_available_beds': 40}}})
+    defaults = default_scenario()
+    assert scenario['duration_days'] == 2
+    assert scenario['acuities']['Minor']['number_of_available_beds'] == 40
+    assert scenario['acuities']['Minor']['length_of_stay'] == defaults['acuities']['Minor']['length_of_stay']
+    assert scenario['acuities']['Major'] == defaults['acuities']['Major']
+    assert scenario['continuous'] is False and scenario['resolution_minutes'] == 60
+
+def test_rows_of_the_tables_give_the_default_scenario(make_table_rows):
+    rows, rows_acuity = make_table_rows(days=30)
+    assert scenario_from_rows(rows + rows_acuity) == default_scenario()
+
+def test_whole_float_bed_counts_become_integers():
+    scenario = validate_scenario({'acuities': {'Resus': {'number_of_available_beds': 12.0}}})
+    assert scenario['acuities']['Resus']['number_of_available_beds'] == 12
+    assert isinstance(scenario['acuities']['Resus']['number_of_available_beds'], int)
+
+@pytest.mark.parametrize("scenario, message", [
+    ([], "JSON object"),
+    ({'beds': 3}, "Unknown parameters: beds"),
+    ({'acuities': {'Trauma': {}}}, "'acuities'"),
+    ({'acuities': {'Major': {'beds': 3}}}, "Parameters of Major"),
+    ({'duration_days': 'x'}, "'duration_days' must be a non-negative number"),
+    ({'duration_days': True}, "'duration_days' must be a non-negative number"),
+    ({'duration_days': 1.5}, "'duration_days' must be an integer"),
+    ({'duration_days': 0}, "'duration_days' must be an integer"),
+    ({'duration_days': MAX_DURATION_DAYS + 1}, "'duration_days' must be an integer"),
+    ({'acuities': {'Major': {'length_of_stay': -1}}}, "'Major.length_of_stay' must be a non-negative number"),
+    ({'acuities': {'Major': {'number_of_available_beds': 0}}}, "'Major.number_of_available_beds' must be a positive integer"),
+    ({'acuities': {'Major': {'number_of_available_beds': 2.5}}}, "'Major.number_of_available_beds' must be a positive integer"),
+    ({'acuities': {'Minor': {'arrivals_after_9': MAX_ARRIVALS_PER_HOUR + 1}}}, "at most"),
+    ({'duration_days': MAX_DURATION_DAYS, 'acuities': {acuity: {'arrivals_before_9': MAX_ARRIVALS_PER_HOUR, 
+                                                                 'arrivals_after_9': MAX_ARRIVALS_PER_HOUR} 
+                                                        for acuity in ['Major', 'Minor']}}, "patients"),
+    ({'min_patience_minor': 9, 'max_patience_minor': 8}, "'min_patience_minor'"),
+    ({'start_date': '01/02/2024'}, "'start_date'"),
+    ({'continuous': 1}, "'continuous'"),
+    ({'resolution_minutes': 7}, "'resolution_minutes'"),
+    ({'resolution_minutes': 0}, "'resolution_minutes'"),
+    ({'los_distribution': 'weibull'}, "'los_distribution'"),
+    ({'los_cv': 0}, "'los_cv'"),
+])
+def test_invalid_scenarios_are_rejected(scenario, message):
+    with pytest.raises(ValueError, match=message):
+        validate_scenario(scenario)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulation_base import EDSimulation
+
+def assert_same_as_pandas(stats, values):
+    expected = pd.Series(values, dtype=np.float64).describe()
+    assert list(stats) == list(expected.index)
+    for key, value in expected.items():
+        if np.isnan(value):
+            assert stats[key] is None
+        else:
+            assert stats[key] == pytest.approx(value, rel=1e-12, abs=1e-12)
+
+@pytest.mark.parametrize("values", [
+    [3.],
+    [1., 2.],
+    [0., 0., 5., 1., 7., 2.],
+    np.random.default_rng(0).poisson(4., size=1001),
+    np.random.default_rng(1).normal(size=250),
+])
+def test_describe_matches_pandas(values):
+    assert_same_as_pandas(EDSimulation.describe(values), values)
+
+def test_describe_of_no_values():
+    stats = EDSimulation.describe([])
+    assert stats["count"] == 0. and all(stats[key] is None for key in stats if key != "count")
+    assert list(stats) == list(pd.Series([], dtype=np.float64).describe().index)
+
+def test_summary_statistics_match_pandas(make_simulation, num_beds):
+    simulation = make_simulation(days=2)
+    simulation.run_simulation(num_beds)
+    summary = simulation.summary_statistics()
+    hourly_wait_time = simulation.calculate_hourly_wait_time()
+    for acuity in simulation.acuities:
+        for key, name in [('Bed Usage', 'bed_usage'), ('Queue Lengths', 'queue_lengths'), ('Total Occupancy', 'total_occupancy')]:
+            assert_same_as_pandas(summary[key][acuity], np.asarray(getattr(simulation, name)[acuity]))
+        assert_same_as_pandas(summary['Average Wait Time'][acuity], hourly_wait_time[acuity])
+
+@pytest.fixture
+def simulation_with_patients(make_simulation):
+    simulation = make_simulation(days=1)
+    simulation.reset_variables()
+    # Major arrives in hours 0 and 3 and Minor in hour 1, nobody in hour 2
+    for patient_id, acuity, arrival_time, wait_time in [(1, "Major", 0, 2), (2, "Major", 0, 4), (3, "Minor", 1, 1), 
+                                                        (4, "Major", 3, 6)]:
+        simulation.update_patient_data(patient_id, acuity, arrival_time, wait_time)
+    return simulation
+
+def test_hours_without_arrivals_count_as_zero(simulation_with_patients):
+    hourly_wait_time = simulation_with_patients.calculate_hourly_wait_time()
+    np.testing.assert_array_equal(hourly_wait_time["Major"], [3., 0., 0., 6.])
+    np.testing.assert_array_equal(hourly_wait_time["Minor"], [0., 1., 0., 0.])
+    np.testing.assert_array_equal(hourly_wait_time["Resus"], [0., 0., 0., 0.])
+
+def test_hourly_wait_time_matches_the_pandas_calculation(simulation_with_patients):
+    hourly_wait_time = simulation_with_patients.calculate_hourly_wait_time()
+    average_wait_time = EDSimulation.calculate_average_wait_time(simulation_with_patients.patient_data)
+    assert list(average_wait_time.index) == [0, 1, 2, 3]
+    for acuity in average_wait_time.columns:
+        np.testing.assert_array_equal(average_wait_time[acuity].values, hourly_wait_time[acuity])
+
+def test_hourly_wait_time_without_patients(make_simulation):
+    simulation = make_simulation(days=1)
+    simulation.reset_variables()
+    assert all(len(values) == 0 for values in simulation.calculate_hourly_wait_time().values())
+    assert simulation.summary_statistics()['Average Wait Time']['Major']['count'] == 0.
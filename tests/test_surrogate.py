@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from models import surrogate as surrogate_module
+from models.surrogate import (FEATURES, KPIS, MAX_TRAINING, MIN_TRAINING, SurrogateModel, features_from_rows, 
+                              features_from_scenario, outputs_from_kpis)
+
+def smooth_outputs(X):
+    # positive outputs that vary smoothly with the first features
+    return np.outer(1 + X[:, 0] + 0.5*X[:, 1], np.arange(1, len(KPIS)+1))
+
+@pytest.fixture(scope="module")
+def training_data():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0., 1., size=(40, len(FEATURES)))
+    return X, smooth_outputs(X)
+
+@pytest.fixture(scope="module")
+def trained(training_data):
+    return SurrogateModel(*training_data)
+
+def test_not_trained_below_min_training(training_data):
+    X, Y = training_data
+    assert not SurrogateModel(X[:MIN_TRAINING-1], Y[:MIN_TRAINING-1]).trained
+    assert SurrogateModel(X[:MIN_TRAINING], Y[:MIN_TRAINING]).trained
+
+def test_prediction_inside_the_training_region(trained):
+    x = np.full(len(FEATURES), 0.5)
+    mean, std, in_domain = trained.predict(x)
+    expected = smooth_outputs(x[None, :])[0]
+    assert in_domain
+    np.testing.assert_allclose(mean, expected, rtol=0.1)
+    assert np.all(std >= 0) and np.all(std < expected)
+
+def test_prediction_outside_the_training_region(trained):
+    x = np.full(len(FEATURES), 0.5)
+    x[3] = 3.
+    assert not trained.predict(x)[2]
+
+def test_add_refits_with_the_new_result(training_data):
+    X, Y = training_data
+    model = SurrogateModel(X[:MIN_TRAINING-1], Y[:MIN_TRAINING-1])
+    model.add(X[MIN_TRAINING-1], Y[MIN_TRAINING-1])
+    assert model.trained
+    assert len(model.X) == MIN_TRAINING
+
+def test_save_and_load_give_the_same_predictions(tmp_path, trained):
+    filepath = str(tmp_path / "surrogate.npz")
+    trained.save(filepath)
+    loaded = SurrogateModel.load(filepath)
+    x = np.full(len(FEATURES), 0.4)
+    np.testing.assert_allclose(loaded.predict(x)[0], trained.predict(x)[0])
+    assert not SurrogateModel.load(str(tmp_path / "missing.npz")).trained
+
+def test_rows_and_kpis_are_ordered_like_features_and_kpis(make_table_rows):
+    rows, rows_acuity = make_table_rows(days=2)
+    x = features_from_rows(rows, rows_acuity)
+    assert x[FEATURES.index('number_of_available_beds|Minor')] == 35
+    assert x[FEATURES.index('MAX PATIENCE MINOR')] == 8
+    assert x[FEATURES.index('SIMULATION DURATION (DAYS)')] == 2
+    from models.simulation import scenario_from_rows
+    np.testing.assert_array_equal(features_from_scenario(scenario_from_rows(rows + rows_acuity)), x)
+    kpis = {prop: {acuity: float(ii) for ii, acuity in enumerate(['Major', 'Minor', 'Resus'])} 
+            for prop in ['Bed Usage', 'Queue Lengths', 'Total Occupancy', 'Average Wait Time']}
+    y = outputs_from_kpis(kpis)
+    assert y[KPIS.index('Queue Lengths|Resus')] == 2.
+
+def test_update_surrogate_is_seen_by_get_surrogate():
+    # SURROGATE_PATH points to the temporary directory of the tests, see conftest.py
+    from models.simulation import default_scenario
+    kpis = {prop: {acuity: 1. for acuity in ['Major', 'Minor', 'Resus']} 
+            for prop in ['Bed Usage', 'Queue Lengths', 'Total Occupancy', 'Average Wait Time']}
+    n_results = len(surrogate_module.get_surrogate().X)
+    assert surrogate_module.update_surrogate(default_scenario(), kpis)
+    assert len(surrogate_module.get_surrogate().X) == n_results + 1
+    # the surrogate only learns the engine options of the app
+    assert not surrogate_module.update_surrogate({**default_scenario(), 'continuous': True}, kpis)
+    assert len(surrogate_module.get_surrogate().X) == n_results + 1
+
+def test_likelihood_gradient_matches_finite_differences(training_data):
+    from scipy.optimize import approx_fprime
+    X, Y = training_data
+    model = SurrogateModel()
+    log_params = np.r_[np.linspace(-0.5, 0.5, len(FEATURES)), 0.2, -3.]
+    gradient = model._negative_log_likelihood(log_params, X, Y)[1]
+    expected = approx_fprime(log_params, lambda p: model._negative_log_likelihood(p, X, Y)[0], 1e-6)
+    np.testing.assert_allclose(gradient, expected, rtol=1e-4, atol=1e-4)
+
+def test_add_extends_the_factorization(training_data):
+    X, Y = training_data
+    model = SurrogateModel(X[:20], Y[:20])
+    model.add(X[20], Y[20])
+    assert model.n_since_optimization == 1 and len(model.L) == 21
+    # the same as a fit with the hyperparameters and normalization of the model
+    K = model._kernel(model.X_normalized, model.X_normalized, model.log_params) + \
+        (np.exp(model.log_params[-1]) + 1e-8)*np.eye(21)
+    np.testing.assert_allclose(model.L @ model.L.T, K, atol=1e-10)
+    # the new result is inside the region the model is trained on
+    assert model.predict(X[20])[2]
+
+def test_training_set_keeps_the_most_recent_results(training_data):
+    X, Y = training_data
+    X_many = np.vstack([X]*(MAX_TRAINING//len(X) + 1))
+    Y_many = np.vstack([Y]*(MAX_TRAINING//len(Y) + 1))
+    model = SurrogateModel(X_many, Y_many, log_params=np.zeros(len(FEATURES)+2))
+    assert len(model.X) == MAX_TRAINING
+    model.add(X[0], Y[0])
+    assert len(model.X) == MAX_TRAINING and np.array_equal(model.X[-1], X[0])
+
+def test_load_restores_the_factorization(tmp_path, trained, monkeypatch):
+    filepath = str(tmp_path / "surrogate.npz")
+    trained.save(filepath)
+    monkeypatch.setattr(SurrogateModel, "fit", lambda *args, **kwargs: pytest.fail("load fitted the model again"))
+    loaded = SurrogateModel.load(filepath)
+    np.testing.assert_allclose(loaded.L, trained.L)
+
+def test_other_durations_are_outside_the_training_region(trained):
+    # every training result has the same duration
+    X = trained.X.copy()
+    X[:, FEATURES.index('SIMULATION DURATION (DAYS)')] = 30.
+    model = SurrogateModel(X, trained.Y)
+    x = X.mean(0)
+    assert model.predict(x)[2]
+    x[FEATURES.index('SIMULATION DURATION (DAYS)')] = 60.
+    assert not model.predict(x)[2]
+
+def test_surrogate_failure_does_not_fail_the_run(monkeypatch, make_table_rows):
+    from models import live_runs
+    def fail(*args):
+        raise RuntimeError("surrogate unavailable")
+    monkeypatch.setattr(surrogate_module, "update_surrogate", fail)
+    from models.simulation import scenario_from_rows, validate_scenario
+    rows, rows_acuity = make_table_rows()
+    run_id = "f"*32
+    live_runs._set_state(run_id, status='running', updates=0)
+    live_runs._run(run_id, validate_scenario(scenario_from_rows(rows + rows_acuity)))
+    state, _ = live_runs.read_live_run(run_id)
+    assert state['status'] == 'done'